@@ -0,0 +1,161 @@
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recomendacoes import CATALOGO_EXERCICIOS, gerar_dieta_fallback, gerar_treino_fallback
+
+# Compara renderizações/s dos fallbacks antigos (concatenação de strings e if/elif,
+# copiados abaixo como referência) com o catálogo pré-compilado e memoizado
+
+def gerar_dieta_fallback_original(dados_usuario):
+    sexo = dados_usuario['sexo']
+    peso = dados_usuario['peso']
+    
+    calorias = int(peso * (37 if sexo == "Masculino" else 35))
+    proteina = int(peso * 2)
+    carbs = int(peso * 4)
+    gordura = int(peso * 1)
+    
+    return f"""
+    ## Recomendação Básica de Dieta para Ganho de Massa
+    
+    ### Calorias diárias: {calorias} kcal
+    - Proteínas: {proteina}g ({proteina * 4} kcal)
+    - Carboidratos: {carbs}g ({carbs * 4} kcal)
+    - Gorduras: {gordura}g ({gordura * 9} kcal)
+    
+    ### Distribuição das refeições:
+    1. **Café da manhã**: Rica em proteínas e carboidratos
+    2. **Lanche da manhã**: Proteína e gorduras boas
+    3. **Almoço**: Proteína, carboidratos complexos e vegetais
+    4. **Lanche da tarde**: Proteína e carboidratos
+    5. **Pré-treino**: Carboidratos rápidos e proteína
+    6. **Pós-treino**: Proteína e carboidratos rápidos
+    7. **Jantar**: Proteína e vegetais
+    
+    ### Alimentos recomendados:
+    - **Proteínas**: frango, peixe, carne vermelha magra, ovos, whey protein
+    - **Carboidratos**: arroz, batata doce, aveia, quinoa, frutas
+    - **Gorduras**: azeite, abacate, castanhas, sementes
+    
+    Hidrate-se bem! Beba pelo menos 35ml de água por kg de peso corporal.
+    """
+
+def gerar_treino_fallback_original(dados_usuario):
+    tipo_treino = dados_usuario['tipo_treino']
+    membros_foco = dados_usuario['membros_foco']
+    
+    treino = "## Programa de Treino Básico para Hipertrofia\n\n"
+    
+    if tipo_treino == "Com aparelhos":
+        treino += """
+        ### Divisão de treino recomendada:
+        - **Segunda**: Peito e Tríceps
+        - **Terça**: Costas e Bíceps
+        - **Quarta**: Descanso ou Cardio leve
+        - **Quinta**: Pernas, Glúteos e Ombros
+        - **Sexta**: Treino dos grupos que deseja focar mais
+        - **Sábado/Domingo**: Descanso
+        
+        ### Princípios gerais:
+        - 3-4 exercícios por grupo muscular
+        - 3-4 séries por exercício
+        - 8-12 repetições (foco em hipertrofia)
+        - Descanso de 60-90 segundos entre séries
+        - Treino com intensidade entre 70-85% de 1RM
+        """
+    else:
+        treino += """
+        ### Divisão de treino recomendada:
+        - **Segunda**: Empurrar (peito, ombros, tríceps)
+        - **Terça**: Puxar (costas, bíceps)
+        - **Quarta**: Descanso ou Cardio leve
+        - **Quinta**: Pernas, Glúteos e Core
+        - **Sexta**: Circuito full body com foco nos grupos prioritários
+        - **Sábado/Domingo**: Descanso
+        
+        ### Princípios gerais:
+        - Utilizar o peso corporal e resistência progressiva
+        - Variar o tempo sob tensão e ângulos de execução
+        - 3-4 séries por exercício
+        - 8-15 repetições (foco em hipertrofia)
+        - Descanso de 60-90 segundos entre séries
+        """
+    
+    for membro in membros_foco:
+        treino += f"\n### Exercícios específicos para {membro}:\n"
+        if membro == "Peito":
+            if tipo_treino == "Com aparelhos":
+                treino += "- Supino reto com barra\n- Crucifixo com halteres\n- Supino inclinado na máquina\n- Crossover no cabo"
+            else:
+                treino += "- Flexões com variações\n- Flexões declinadas\n- Flexões diamante\n- Dips entre cadeiras"
+        elif membro == "Costas":
+            if tipo_treino == "Com aparelhos":
+                treino += "- Puxada na frente\n- Remada curvada\n- Pulldown\n- Remada unilateral com halter"
+            else:
+                treino += "- Barras\n- Remadas invertidas\n- Superman\n- Remada com elástico"
+        elif membro == "Pernas":
+            if tipo_treino == "Com aparelhos":
+                treino += "- Agachamento com barra\n- Leg press\n- Cadeira extensora\n- Mesa flexora"
+            else:
+                treino += "- Agachamentos\n- Afundos\n- Stiff com peso corporal\n- Bulgarian split squat"
+        elif membro == "Braços":
+            if tipo_treino == "Com aparelhos":
+                treino += "- Rosca direta\n- Rosca scott\n- Tríceps corda\n- Tríceps francês"
+            else:
+                treino += "- Rosca com elástico\n- Dips para tríceps\n- Flexões diamante\n- Rosca martelo com garrafa pet"
+        elif membro == "Ombros":
+            if tipo_treino == "Com aparelhos":
+                treino += "- Desenvolvimento com halteres\n- Elevação lateral\n- Face pull\n- Desenvolvimento arnold"
+            else:
+                treino += "- Pike push-ups\n- Elevação lateral com garrafas\n- Elevação frontal com objetos\n- Flexões em Y"
+        elif membro == "Glúteos":
+            if tipo_treino == "Com aparelhos":
+                treino += "- Hip thrust com barra\n- Abdução de quadril na máquina\n- Elevação pélvica\n- Coice na polia"
+            else:
+                treino += "- Hip thrust com peso corporal\n- Ponte de glúteos\n- Elevação de quadril unilateral\n- Fire hydrant (hidrante)"
+    
+    return treino
+
+
+def gerar_perfis(quantidade, semente=0):
+    aleatorio = random.Random(semente)
+    membros = list(CATALOGO_EXERCICIOS)
+    return [
+        {
+            "sexo": aleatorio.choice(["Masculino", "Feminino"]),
+            "peso": round(aleatorio.uniform(40, 150), 1),
+            "tipo_treino": aleatorio.choice(["Com aparelhos", "Sem aparelhos (calistenia, elásticos, etc.)"]),
+            "membros_foco": aleatorio.sample(membros, aleatorio.randint(0, len(membros))),
+        }
+        for _ in range(quantidade)
+    ]
+
+def medir(funcao, perfis, repeticoes):
+    def rodar():
+        for perfil in perfis:
+            funcao(perfil)
+    melhor = min(timeit.repeat(rodar, number=1, repeat=repeticoes))
+    return len(perfis) / melhor
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--perfis", type=int, default=20_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    perfis = gerar_perfis(args.perfis)
+    for nome, antes, depois in (
+        ("treino", gerar_treino_fallback_original, gerar_treino_fallback),
+        ("dieta", gerar_dieta_fallback_original, gerar_dieta_fallback),
+    ):
+        original = medir(antes, perfis, args.repeticoes)
+        atual = medir(depois, perfis, args.repeticoes)
+        print(f"{nome}: antes {original:,.0f} renders/s, depois {atual:,.0f} renders/s ({atual / original:.1f}x)")
+
+if __name__ == "__main__":
+    main()
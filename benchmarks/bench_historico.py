@@ -0,0 +1,85 @@
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+
+from historico import COLUNAS_MEDIDAS, Historico
+from instrumentacao import percentil
+
+# Preenche o histórico com milhões de medições (muitos usuários, uma medição a cada 4 semanas)
+# e mede a gravação em lote e a consulta do histórico de um usuário pelo índice (usuario, data)
+
+INICIO = datetime(2020, 1, 1)
+
+def gerar_medicoes(usuarios, por_usuario, aleatorio):
+    for indice in range(usuarios):
+        usuario = f"usuario{indice:07d}@exemplo.com"
+        peso = aleatorio.uniform(50, 110)
+        medidas = {coluna: aleatorio.uniform(30, 110) for coluna in COLUNAS_MEDIDAS.values()}
+        for semana in range(por_usuario):
+            yield {
+                "usuario": usuario,
+                "data": INICIO + timedelta(weeks=4 * semana, hours=indice % 24),
+                "peso": round(peso + 0.3 * semana + aleatorio.gauss(0, 0.5), 1),
+                **{coluna: round(valor + 0.1 * semana + aleatorio.gauss(0, 0.3), 1) for coluna, valor in medidas.items()},
+            }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--por-usuario", type=int, default=50, help="medições por usuário")
+    parser.add_argument("--lote", type=int, default=50_000, help="linhas por transação na gravação")
+    parser.add_argument("--consultas", type=int, default=500)
+    parser.add_argument("--url", help="banco a usar (padrão: SQLite em um diretório temporário)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        historico = Historico(args.url or f"sqlite:///{diretorio}/historico.db")
+        aleatorio = random.Random(0)
+        usuarios = args.linhas // args.por_usuario
+
+        inicio = time.perf_counter()
+        lote = []
+        for registro in gerar_medicoes(usuarios, args.por_usuario, aleatorio):
+            lote.append(registro)
+            if len(lote) >= args.lote:
+                historico.inserir_medicoes(lote)
+                lote = []
+        if lote:
+            historico.inserir_medicoes(lote)
+        duracao = time.perf_counter() - inicio
+        total = usuarios * args.por_usuario
+        print(f"gravação: {total} linhas em {duracao:.1f} s ({total / duracao:,.0f} linhas/s)")
+
+        with historico.engine.connect() as conexao:
+            plano = conexao.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM medicoes WHERE usuario = 'x' AND data >= '2021-01-01' ORDER BY data"
+            )).all() if historico.engine.dialect.name == "sqlite" else []
+        for linha in plano:
+            print(f"plano: {linha[-1]}")
+
+        for nome, desde in (("histórico completo", None), ("último ano", INICIO + timedelta(weeks=4 * args.por_usuario - 52))):
+            latencias = []
+            linhas = 0
+            for _ in range(args.consultas):
+                usuario = f"usuario{aleatorio.randrange(usuarios):07d}@exemplo.com"
+                inicio = time.perf_counter()
+                medicoes = historico.carregar_medicoes(usuario, inicio=desde)
+                latencias.append(time.perf_counter() - inicio)
+                linhas += len(medicoes)
+            print(
+                f"consulta ({nome}): p50 {statistics.median(latencias) * 1000:.2f} ms, "
+                f"p95 {percentil(latencias, 95) * 1000:.2f} ms, {linhas / args.consultas:.0f} linhas por usuário"
+            )
+        historico.engine.dispose()
+
+if __name__ == "__main__":
+    main()
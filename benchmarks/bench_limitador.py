@@ -0,0 +1,143 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import openrouter
+from limitador import FilaCheia, LimitadorTaxa
+from mock_openrouter import iniciar_servidor
+
+# Cenários do limitador contra o servidor de teste:
+# 1) rajada de gerações contra um servidor que responde 429 acima do limite, com e sem o limitador;
+# 2) tempestade de 429: toda requisição falha e as retentativas também precisam de ficha, então o
+#    upstream não recebe mais que a rajada mais a taxa do limitador;
+# 3) fila pequena: os pedidos que não cabem nela terminam na hora com FilaCheia (fallback imediato);
+# 4) menos trabalhadores que gerações, como no app: as retentativas de quem está rodando não podem
+#    ficar esperando a vez de gerações que ainda não saíram da fila do executor
+
+def disparar(servidor, pedidos, limitador, executor, sessao):
+    servidor.contadores.clear()
+    servidor.reiniciar_limite()
+    geracoes = []
+    for i in range(pedidos):
+        payload = {"model": "mock", "messages": [{"role": "user", "content": f"perfil {i}"}]}
+        inicio = time.perf_counter()
+        geracao = openrouter.gerar_em_segundo_plano(executor, payload, "chave-teste", sessao, limitador=limitador)
+        geracoes.append((inicio, time.perf_counter() - inicio, geracao))
+    return geracoes
+
+def executar_cenario(nome, servidor, pedidos, limitador, executor, sessao):
+    inicio = time.perf_counter()
+    geracoes = disparar(servidor, pedidos, limitador, executor, sessao)
+    latencias = []
+    resultado = {"sucessos": 0, "fallbacks": 0, "recusados_fila": 0}
+    for iniciado_em, _, geracao in geracoes:
+        try:
+            "".join(geracao.acompanhar())
+            resultado["sucessos"] += 1
+            latencias.append(time.perf_counter() - iniciado_em)
+        except FilaCheia:
+            resultado["recusados_fila"] += 1
+        except Exception:
+            resultado["fallbacks"] += 1
+
+    resultado["requisicoes_no_servidor"] = servidor.contadores["requisicoes"]
+    resultado["429_no_servidor"] = servidor.contadores["status_429"]
+    resultado["duracao_s"] = round(time.perf_counter() - inicio, 2)
+    if latencias:
+        resultado["latencia_p50_s"] = round(statistics.median(latencias), 2)
+        resultado["latencia_max_s"] = round(max(latencias), 2)
+    print(nome, resultado)
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pedidos", type=int, default=30)
+    parser.add_argument("--limite-servidor-rpm", type=float, default=120)
+    parser.add_argument("--limitador-rpm", type=float, default=110)
+    parser.add_argument("--rajada", type=float, default=5)
+    parser.add_argument("--tamanho-fila", type=int, default=50)
+    parser.add_argument("--latencia", type=float, default=0.2)
+    parser.add_argument("--pedidos-tempestade", type=int, default=6)
+    parser.add_argument("--rpm-tempestade", type=float, default=120)
+    parser.add_argument("--fila-pequena", type=int, default=2)
+    parser.add_argument("--trabalhadores", type=int, default=2, help="threads do executor no cenário 4")
+    parser.add_argument("--timeout", type=float, default=30, help="espera máxima por geração no cenário 4")
+    args = parser.parse_args()
+
+    executor = ThreadPoolExecutor(max_workers=max(args.pedidos, args.pedidos_tempestade))
+    sessao = openrouter.obter_sessao_http()
+    falhas = []
+
+    servidor = iniciar_servidor(latencia=args.latencia, limite_rpm=args.limite_servidor_rpm, rajada=args.rajada, status_erro=429)
+    openrouter.OPENROUTER_URL = servidor.url
+    sem_limitador = executar_cenario("sem limitador", servidor, args.pedidos, None, executor, sessao)
+    limitador = LimitadorTaxa(args.limitador_rpm, args.rajada, args.tamanho_fila)
+    com_limitador = executar_cenario("com limitador", servidor, args.pedidos, limitador, executor, sessao)
+    print("limitador", limitador.estatisticas())
+    if com_limitador["429_no_servidor"] >= sem_limitador["429_no_servidor"] or com_limitador["fallbacks"] > sem_limitador["fallbacks"]:
+        falhas.append("o limitador não reduziu os 429 e os fallbacks da rajada")
+
+    # Todas as respostas são 429: sem ficha por tentativa, as retentativas passariam do limite
+    tempestade = iniciar_servidor(latencia=0.0, status_erro=429, falhas_iniciais=10 ** 9)
+    openrouter.OPENROUTER_URL = tempestade.url
+    limitador = LimitadorTaxa(args.rpm_tempestade, rajada=2, tamanho_fila=args.tamanho_fila)
+    resultado = executar_cenario("tempestade de 429", tempestade, args.pedidos_tempestade, limitador, executor, sessao)
+    print("limitador", limitador.estatisticas())
+    permitidas = limitador.rajada + limitador.taxa * resultado["duracao_s"]
+    print(f"requisições ao upstream: {resultado['requisicoes_no_servidor']} (limite {permitidas:.1f})")
+    if resultado["requisicoes_no_servidor"] > permitidas + 1:
+        falhas.append("as retentativas passaram do limite de requisições do limitador")
+    if resultado["requisicoes_no_servidor"] <= args.pedidos_tempestade:
+        falhas.append("o cenário de tempestade não chegou a retentar")
+
+    # Fila com poucos lugares e fichas que demoram: quem não cabe recebe FilaCheia sem esperar
+    lento = iniciar_servidor(latencia=args.latencia)
+    openrouter.OPENROUTER_URL = lento.url
+    limitador = LimitadorTaxa(6, rajada=1, tamanho_fila=args.fila_pequena)
+    geracoes = disparar(lento, args.fila_pequena + 4, limitador, executor, sessao)
+    recusadas = [(duracao, geracao) for _, duracao, geracao in geracoes if isinstance(geracao.erro, FilaCheia)]
+    print(
+        f"fila pequena: {len(recusadas)} de {len(geracoes)} recusadas, "
+        f"pior tempo até o erro {max((duracao for duracao, _ in recusadas), default=0) * 1000:.1f} ms"
+    )
+    if len(recusadas) != 4 or any(not geracao.concluida or duracao > 0.05 for duracao, geracao in recusadas):
+        falhas.append("pedidos além da fila não terminaram na hora com FilaCheia")
+    for _, _, geracao in geracoes:
+        geracao.aguardar(0, 30)
+
+    # Primeiras respostas 429: cada geração rodando precisa de mais fichas enquanto outras esperam um trabalhador
+    instavel = iniciar_servidor(latencia=0.0, status_erro=429, falhas_iniciais=args.trabalhadores)
+    openrouter.OPENROUTER_URL = instavel.url
+    limitador = LimitadorTaxa(600, rajada=args.trabalhadores, tamanho_fila=args.tamanho_fila)
+    poucos = ThreadPoolExecutor(max_workers=args.trabalhadores)
+    inicio = time.perf_counter()
+    geracoes = disparar(instavel, args.trabalhadores * 2, limitador, poucos, sessao)
+    for _, _, geracao in geracoes:
+        while not geracao.concluida and time.perf_counter() < inicio + args.timeout:
+            geracao.aguardar(len(geracao.trechos), inicio + args.timeout - time.perf_counter())
+    concluidas = sum(geracao.concluida for _, _, geracao in geracoes)
+    print(
+        f"{args.trabalhadores} trabalhadores: {concluidas} de {len(geracoes)} gerações concluídas "
+        f"em {time.perf_counter() - inicio:.2f} s, limitador {limitador.estatisticas()}"
+    )
+    if concluidas != len(geracoes):
+        falhas.append("com menos trabalhadores que gerações, as retentativas travaram na fila do limitador")
+    elif any(geracao.erro is not None for _, _, geracao in geracoes):
+        falhas.append("gerações com menos trabalhadores falharam depois de uma única resposta 429")
+    poucos.shutdown(wait=False, cancel_futures=True)
+
+    for falha in falhas:
+        print(f"FALHA: {falha}")
+    if falhas:
+        # Sem os._exit, threads travadas no limitador impediriam o processo de terminar
+        sys.stdout.flush()
+        os._exit(1)
+
+if __name__ == "__main__":
+    main()
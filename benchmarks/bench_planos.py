@@ -0,0 +1,76 @@
+import argparse
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+import zstandard
+
+from planos import gerar_fallback_estruturado, plano_para_markdown, texto_para_plano
+
+# Compara o mesmo plano em markdown e estruturado (bytes do orjson): tamanho da entrada do cache,
+# custo de validar a resposta do LLM, de ler um campo e de exibir (execução do script no AppTest)
+
+PERFIL = {
+    "sexo": "Masculino",
+    "peso": 80.0,
+    "tipo_treino": "Com aparelhos",
+    "membros_foco": ["Peito", "Costas", "Braços"],
+}
+
+def exibir_markdown(texto):
+    import streamlit as st
+
+    st.markdown(texto)
+
+def exibir_estruturado(tipo_recomendacao, dados):
+    from planos import exibir_plano
+
+    exibir_plano(tipo_recomendacao, dados)
+
+def tempo_execucao(funcao, args, repeticoes):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(funcao, args=args, default_timeout=30)
+    at.run()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        at.run()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+def micro(funcao, numero):
+    return min(timeit.repeat(funcao, number=numero, repeat=5)) / numero * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=50, help="execuções do AppTest por formato")
+    parser.add_argument("--numero", type=int, default=2000, help="chamadas por medição das funções")
+    args = parser.parse_args()
+
+    for tipo_recomendacao, campo in (("dieta", "proteinas_g"), ("programa de treino", "dias")):
+        dados = gerar_fallback_estruturado(PERFIL, tipo_recomendacao)
+        texto = plano_para_markdown(tipo_recomendacao, dados)
+        resposta_llm = f"```json\n{orjson.dumps(orjson.loads(dados), option=orjson.OPT_INDENT_2).decode()}\n```"
+        markdown = texto.encode("utf-8")
+
+        print(f"== {tipo_recomendacao}")
+        print(
+            f"entrada do cache: markdown {len(markdown)} B (zstd {len(zstandard.compress(markdown))} B), "
+            f"estruturado {len(dados)} B (zstd {len(zstandard.compress(dados))} B)"
+        )
+        print(f"validação da resposta do LLM (orjson + pydantic): {micro(lambda: texto_para_plano(tipo_recomendacao, resposta_llm), args.numero):.1f} µs")
+        print(f"leitura de um campo ({campo}): {micro(lambda: orjson.loads(dados)[campo], args.numero):.1f} µs")
+        print(f"conversão para markdown (download/PDF): {micro(lambda: plano_para_markdown.__wrapped__(tipo_recomendacao, dados), args.numero):.1f} µs")
+        print(
+            f"execução do script: markdown {tempo_execucao(exibir_markdown, (texto,), args.repeticoes):.1f} ms, "
+            f"tabelas {tempo_execucao(exibir_estruturado, (tipo_recomendacao, dados), args.repeticoes):.1f} ms (p50)"
+        )
+
+if __name__ == "__main__":
+    main()
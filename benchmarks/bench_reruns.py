@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from instrumentacao import percentil
+from mock_openrouter import iniciar_servidor
+
+# Mede o tempo de execução do script da página por interação (amostras de execucao_script
+# e dos fragmentos registradas pelo próprio app), na tela inicial e com os resultados na tela.
+# O AppTest sempre executa o script inteiro; no navegador, campos dentro de um st.form
+# não disparam rerun, então essas alterações custam zero e só o envio executa o script
+
+APP = RAIZ / "massa_muscular.py"
+# Trechos da página cronometrados separadamente (o fragmento também roda sozinho a cada download)
+ETAPAS_PAGINA = ("resumo_metricas", "fragmento_planos")
+
+def widget(elementos, rotulo):
+    return next(elemento for elemento in elementos if elemento.label == rotulo)
+
+def resumo(amostras):
+    if not amostras:
+        return "sem amostras"
+    return f"p50 {percentil(amostras, 50) * 1000:.1f} ms, p95 {percentil(amostras, 95) * 1000:.1f} ms ({len(amostras)} execuções)"
+
+def custo_alteracao(campo, amostras):
+    if campo.proto.form_id:
+        return f"0 ms (campo em st.form, sem rerun; o envio custa {resumo(amostras)})"
+    return resumo(amostras)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interacoes", type=int, default=50, help="reruns medidos em cada tela")
+    args = parser.parse_args()
+
+    servidor = iniciar_servidor(latencia=0.05, atraso_trecho=0)
+    os.environ.update({
+        "OPENROUTER_URL": servidor.url,
+        "OPENROUTER_API_KEY": "chave-bench",
+        "INSTRUMENTACAO_ATIVA": "1",
+    })
+
+    from streamlit.testing.v1 import AppTest
+
+    import instrumentacao
+
+    at = AppTest.from_file(str(APP), default_timeout=60)
+    at.run()
+
+    # Tela inicial: cada alteração de campo do formulário
+    inicio = len(instrumentacao.METRICAS.amostras("execucao_script"))
+    idade = widget(at.number_input, "Idade:")
+    for i in range(args.interacoes):
+        idade.set_value(20 + i % 40)
+        at.run()
+    tela_inicial = instrumentacao.METRICAS.amostras("execucao_script")[inicio:]
+
+    widget(at.button, "Gerar Recomendações").click()
+    at.run()
+
+    # Resultados na tela: alterações de campo depois da geração
+    inicio = len(instrumentacao.METRICAS.amostras("execucao_script"))
+    for i in range(args.interacoes):
+        widget(at.number_input, "Idade:").set_value(20 + i % 40)
+        at.run()
+    resultados = instrumentacao.METRICAS.amostras("execucao_script")[inicio:]
+
+    campo = widget(at.number_input, "Idade:")
+    print(f"alteração de campo, tela inicial: {custo_alteracao(campo, tela_inicial)}")
+    print(f"alteração de campo, com resultados: {custo_alteracao(campo, resultados)}")
+    for linha in instrumentacao.METRICAS.percentis():
+        if linha["etapa"] in ETAPAS_PAGINA:
+            print(f"{linha['etapa']}: p50 {linha['p50_ms']} ms, p95 {linha['p95_ms']} ms ({linha['total']} execuções)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import openrouter
+import roteador as modulo_roteador
+from instrumentacao import percentil
+from mock_openrouter import iniciar_servidor
+from roteador import Roteador, Rota
+
+# Roteamento entre modelos contra servidores de teste com atrasos e erros injetados:
+# 1) o modelo principal está lento e sobrecarregado (503) e existe um segundo modelo saudável;
+# 2) os dois modelos têm cauda de latência (uma fração das respostas demora segundos a mais),
+#    com e sem o pedido em paralelo (hedge) disparado no p95 da rota;
+# 3) uma rota mais lenta que só perde as disputas: os hedges cancelados não podem trazê-la para a frente
+
+def executar_cenario(nome, pedidos, concorrencia, roteador, sessao):
+    executor = ThreadPoolExecutor(max_workers=concorrencia)
+
+    def pedir(indice):
+        payload = {"model": "mock", "messages": [{"role": "user", "content": f"perfil {indice}"}]}
+        inicio = time.perf_counter()
+        geracao = openrouter.gerar_em_segundo_plano(executor, payload, "chave-teste", sessao, roteador=roteador)
+        try:
+            "".join(geracao.acompanhar())
+        except Exception:
+            return None
+        return time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as clientes:
+        resultados = list(clientes.map(pedir, range(pedidos)))
+    executor.shutdown()
+
+    latencias = [latencia for latencia in resultados if latencia is not None]
+    resultado = {"sucessos": len(latencias), "fallbacks": pedidos - len(latencias)}
+    if latencias:
+        resultado["p50_s"] = round(statistics.median(latencias), 2)
+        resultado["p95_s"] = round(percentil(latencias, 95), 2)
+        resultado["max_s"] = round(max(latencias), 2)
+    if roteador is not None:
+        resultado.update(roteador.estatisticas())
+    print(nome, resultado)
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pedidos", type=int, default=60)
+    parser.add_argument("--concorrencia", type=int, default=6)
+    parser.add_argument("--latencia-lenta", type=float, default=1.5, help="latência do modelo sobrecarregado")
+    parser.add_argument("--taxa-erro-lenta", type=float, default=0.3)
+    parser.add_argument("--latencia", type=float, default=0.2)
+    parser.add_argument("--prob-lentidao", type=float, default=0.1)
+    parser.add_argument("--atraso-lentidao", type=float, default=3.0)
+    parser.add_argument("--latencia-vencedora", type=float, default=0.6, help="cenário 3: rota que vence as disputas")
+    parser.add_argument("--latencia-perdedora", type=float, default=2.0, help="cenário 3: rota que perde as disputas")
+    parser.add_argument("--pedidos-sequenciais", type=int, default=12)
+    args = parser.parse_args()
+
+    sessao = openrouter.obter_sessao_http()
+    falhas = []
+
+    sobrecarregado = iniciar_servidor(latencia=args.latencia_lenta, taxa_erro=args.taxa_erro_lenta, status_erro=503)
+    saudavel = iniciar_servidor(latencia=args.latencia)
+    # Sem roteador, tudo vai para o OPENROUTER_URL (o modelo sobrecarregado)
+    openrouter.OPENROUTER_URL = sobrecarregado.url
+    unico = executar_cenario("modelo único", args.pedidos, args.concorrencia, None, sessao)
+    roteado = executar_cenario(
+        "roteador",
+        args.pedidos,
+        args.concorrencia,
+        Roteador([Rota("modelo-sobrecarregado", sobrecarregado.url), Rota("modelo-saudavel", saudavel.url)]),
+        sessao,
+    )
+    print("requisições por servidor:", {"sobrecarregado": sobrecarregado.contadores["requisicoes"], "saudavel": saudavel.contadores["requisicoes"]})
+    if roteado["fallbacks"] > unico["fallbacks"] or roteado.get("p50_s", 0) >= unico.get("p50_s", 0):
+        falhas.append("o roteador não melhorou a latência mediana nem os fallbacks do modelo sobrecarregado")
+
+    servidores = [
+        iniciar_servidor(latencia=args.latencia, prob_lentidao=args.prob_lentidao, atraso_lentidao=args.atraso_lentidao)
+        for _ in range(2)
+    ]
+    p95 = {}
+    for nome, hedge in (("cauda sem hedge", False), ("cauda com hedge", True)):
+        roteador = Roteador([Rota(f"modelo-{indice}", servidor.url) for indice, servidor in enumerate(servidores)], hedge=hedge)
+        p95[hedge] = executar_cenario(nome, args.pedidos, args.concorrencia, roteador, sessao).get("p95_s")
+    print("respostas lentas injetadas:", sum(servidor.contadores["lentas"] for servidor in servidores))
+    if p95[True] is None or p95[False] is None or p95[True] >= p95[False]:
+        falhas.append("o hedge não reduziu o p95 com cauda de latência")
+
+    # Hedge já no prazo mínimo, para que a rota lenta seja disparada e cancelada desde o primeiro pedido
+    modulo_roteador.ROTEADOR_HEDGE_PADRAO = modulo_roteador.ROTEADOR_HEDGE_MINIMO
+    vencedora = iniciar_servidor(latencia=args.latencia_vencedora)
+    perdedora = iniciar_servidor(latencia=args.latencia_perdedora)
+    roteador = Roteador([Rota("modelo-rapido", vencedora.url), Rota("modelo-lento", perdedora.url)])
+    disputas = executar_cenario("hedges cancelados", args.pedidos_sequenciais, 1, roteador, sessao)
+    if disputas.get("p95_s", args.latencia_perdedora) >= args.latencia_perdedora or roteador.ordenar()[0].modelo != "modelo-rapido":
+        falhas.append("hedges cancelados puseram a rota lenta na frente da rápida")
+
+    for falha in falhas:
+        print(f"FALHA: {falha}")
+    if falhas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import openrouter
+from mock_openrouter import iniciar_servidor
+from tarefas import TabelaTarefas
+
+# Sessões que interrompem a consulta no meio da geração (como um rerun do script) e voltam a
+# consultar a tabela de tarefas, mais sessões repetidas com o mesmo perfil: cada perfil deve
+# custar uma única requisição ao upstream. Depois do TTL a tabela deve ficar vazia
+
+def simular_sessao(tabela, sessao_http, indice, perfis, interrupcoes):
+    sessao = f"sessao{indice}"
+    chave = f"perfil{indice % perfis}"
+    payload = {"model": "mock", "messages": [{"role": "user", "content": chave}]}
+    iniciar = partial(openrouter.gerar_em_segundo_plano, tabela.executor, payload, "chave-teste", sessao_http)
+    inicio = time.perf_counter()
+    tabela.obter_ou_iniciar(sessao, "dieta", chave, iniciar)
+    for _ in range(interrupcoes):
+        # A execução do script é interrompida; a seguinte só encontra a tarefa pela sessão
+        geracao = tabela.consultar(sessao, "dieta")
+        geracao.aguardar(len(geracao.trechos), 0.1)
+    geracao = tabela.consultar(sessao, "dieta")
+    texto = "".join(geracao.acompanhar())
+    tabela.liberar(sessao, "dieta")
+    return time.perf_counter() - inicio, texto
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessoes", type=int, default=40)
+    parser.add_argument("--perfis", type=int, default=10)
+    parser.add_argument("--interrupcoes", type=int, default=3, help="consultas interrompidas por sessão antes da final")
+    parser.add_argument("--latencia", type=float, default=0.5)
+    parser.add_argument("--atraso-trecho", type=float, default=0.01)
+    parser.add_argument("--ttl", type=float, default=1.0)
+    args = parser.parse_args()
+
+    servidor = iniciar_servidor(latencia=args.latencia, atraso_trecho=args.atraso_trecho)
+    openrouter.OPENROUTER_URL = servidor.url
+    tabela = TabelaTarefas(ttl=args.ttl)
+    sessao_http = openrouter.obter_sessao_http()
+
+    with ThreadPoolExecutor(max_workers=args.sessoes) as sessoes:
+        resultados = list(sessoes.map(
+            lambda indice: simular_sessao(tabela, sessao_http, indice, args.perfis, args.interrupcoes),
+            range(args.sessoes),
+        ))
+    latencias = [latencia for latencia, _ in resultados]
+    print(
+        f"{args.sessoes} sessões, {args.perfis} perfis: {servidor.contadores['requisicoes']} requisições ao upstream, "
+        f"p50 {statistics.median(latencias):.2f} s, max {max(latencias):.2f} s"
+    )
+    print("tabela", tabela.estatisticas())
+    time.sleep(args.ttl + 0.1)
+    depois = tabela.estatisticas()
+    print("após o TTL", depois)
+
+    falhas = []
+    if servidor.contadores["requisicoes"] != args.perfis:
+        falhas.append(f"{servidor.contadores['requisicoes']} requisições para {args.perfis} perfis")
+    if any(not texto for _, texto in resultados):
+        falhas.append("sessões sem texto")
+    if depois["tarefas"] or depois["sessoes"]:
+        falhas.append("tarefas concluídas continuaram na tabela depois do TTL")
+    for falha in falhas:
+        print(f"FALHA: {falha}")
+    if falhas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from instrumentacao import percentil
+from mock_openrouter import iniciar_servidor
+
+# Teste de carga do app: cada processo simula sessões com streamlit.testing.v1.AppTest
+# (preenche o formulário, clica em "Gerar Recomendações" e percorre os Resultados)
+# contra o servidor de teste local, e o resultado é comparado com uma baseline em JSON.
+# O AppTest usa um Runtime global, por isso as sessões paralelas rodam em processos separados.
+
+APP = RAIZ / "massa_muscular.py"
+DIRETORIO_BASELINES = Path(__file__).resolve().parent / "baselines"
+MEMBROS = ["Peito", "Costas", "Pernas", "Braços", "Ombros", "Glúteos"]
+TITULOS_FALLBACK = ("Recomendação Básica de Dieta", "Programa de Treino Básico")
+# Fixo (e não o número de CPUs) para a baseline valer em qualquer máquina: as sessões de um mesmo
+# processo rodam uma depois da outra, então só há sessões simultâneas com mais de um processo
+PROCESSOS_PADRAO = 4
+
+# Métricas comparadas com a baseline: caminho no JSON e se maior é melhor
+METRICAS_COMPARADAS = {
+    "latencia_ponta_a_ponta_s.p50": False,
+    "latencia_ponta_a_ponta_s.p95": False,
+    "rerun_s.p50": False,
+    "rerun_s.p95": False,
+    "execucao_script_s.p50": False,
+    "memoria_por_sessao_mb": False,
+    "sessoes_por_minuto": True,
+}
+
+def memoria_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for linha in status:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fora do Linux fica o pico de memória, que é o que o sistema oferece
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentis(valores):
+    if not valores:
+        return {}
+    return {**{f"p{p}": round(percentil(valores, p), 4) for p in (50, 95, 99)}, "max": round(max(valores), 4)}
+
+def widget(elementos, rotulo):
+    return next(elemento for elemento in elementos if elemento.label == rotulo)
+
+def simular_sessao(indice, perfis_distintos, reruns, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    aleatorio = random.Random(indice if perfis_distintos else 0)
+    at = AppTest.from_file(str(APP), default_timeout=timeout)
+    resultado = {"reruns": []}
+
+    inicio = time.perf_counter()
+    at.run()
+    resultado["reruns"].append(time.perf_counter() - inicio)
+
+    widget(at.selectbox, "Sexo:").set_value(aleatorio.choice(["Masculino", "Feminino"]))
+    widget(at.number_input, "Idade:").set_value(aleatorio.randint(18, 60))
+    widget(at.number_input, "Peso (kg):").set_value(round(aleatorio.uniform(50, 120), 1))
+    widget(at.number_input, "Altura (cm):").set_value(aleatorio.randint(150, 200))
+    widget(at.multiselect, "Quais áreas você deseja focar?").set_value(aleatorio.sample(MEMBROS, 2))
+
+    inicio = time.perf_counter()
+    widget(at.button, "Gerar Recomendações").click()
+    at.run()
+    resultado["ponta_a_ponta"] = time.perf_counter() - inicio
+    resultado["excecoes"] = len(at.exception)
+    resultado["fallback"] = any(titulo in elemento.value for elemento in at.markdown for titulo in TITULOS_FALLBACK)
+
+    # Interações com os Resultados já na tela (cada uma é um rerun completo do script)
+    for _ in range(reruns):
+        widget(at.slider, "Quantos dias por semana você pode treinar?").set_value(aleatorio.randint(2, 6))
+        inicio = time.perf_counter()
+        at.run()
+        resultado["reruns"].append(time.perf_counter() - inicio)
+    return at, resultado
+
+# Executado em cada processo: uma sessão de aquecimento (imports) e depois as sessões medidas
+def executar_processo(indices, perfis_distintos, reruns, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    import instrumentacao
+
+    AppTest.from_file(str(APP), default_timeout=timeout).run()
+    memoria_inicial = memoria_mb()
+    sessoes = []
+    resultados = []
+    for indice in indices:
+        at, resultado = simular_sessao(indice, perfis_distintos, reruns, timeout)
+        # As sessões continuam vivas para a memória refletir sessões simultâneas
+        sessoes.append(at)
+        resultados.append(resultado)
+    return {
+        "resultados": resultados,
+        "memoria_por_sessao_mb": (memoria_mb() - memoria_inicial) / max(1, len(sessoes)),
+        "execucao_script": instrumentacao.METRICAS.amostras("execucao_script"),
+    }
+
+def executar_carga(sessoes, processos, perfis_distintos, reruns, timeout, configuracao_servidor, streaming=True):
+    servidor = iniciar_servidor(**configuracao_servidor)
+    # Os processos filhos herdam estas variáveis antes de importar o app
+    os.environ.update({
+        "OPENROUTER_URL": servidor.url,
+        "OPENROUTER_API_KEY": "chave-carga",
+        "OPENROUTER_STREAMING": "1" if streaming else "0",
+        "OPENROUTER_BACKOFF_INICIAL": "0.2",
+        "LIMITE_REQUISICOES_POR_MINUTO": os.environ.get("LIMITE_REQUISICOES_POR_MINUTO", "100000"),
+        "LIMITE_RAJADA": os.environ.get("LIMITE_RAJADA", "1000"),
+        "INSTRUMENTACAO_ATIVA": "1",
+    })
+
+    processos = min(processos, sessoes)
+    por_processo = math.ceil(sessoes / processos)
+    lotes = [list(range(i, min(i + por_processo, sessoes))) for i in range(0, sessoes, por_processo)]
+
+    inicio = time.perf_counter()
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(lotes), mp_context=contexto) as executor:
+        parciais = list(executor.map(
+            executar_processo,
+            lotes,
+            [perfis_distintos] * len(lotes),
+            [reruns] * len(lotes),
+            [timeout] * len(lotes),
+        ))
+    duracao = time.perf_counter() - inicio
+
+    resultados = [resultado for parcial in parciais for resultado in parcial["resultados"]]
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "configuracao": {
+            "sessoes": sessoes,
+            "processos": len(lotes),
+            "perfis_distintos": perfis_distintos,
+            "reruns": reruns,
+            "streaming": streaming,
+            "servidor": configuracao_servidor,
+        },
+        "duracao_s": round(duracao, 2),
+        "sessoes_por_minuto": round(len(resultados) / duracao * 60, 2),
+        "excecoes": sum(resultado["excecoes"] for resultado in resultados),
+        "sessoes_com_fallback": sum(resultado["fallback"] for resultado in resultados),
+        "latencia_ponta_a_ponta_s": percentis([resultado["ponta_a_ponta"] for resultado in resultados]),
+        "rerun_s": percentis([rerun for resultado in resultados for rerun in resultado["reruns"]]),
+        "execucao_script_s": percentis([amostra for parcial in parciais for amostra in parcial["execucao_script"]]),
+        "memoria_por_sessao_mb": round(sum(parcial["memoria_por_sessao_mb"] for parcial in parciais) / len(parciais), 2),
+        "upstream": dict(servidor.contadores),
+    }
+
+def valor(relatorio, caminho):
+    for parte in caminho.split("."):
+        relatorio = relatorio.get(parte, {}) if isinstance(relatorio, dict) else {}
+    return relatorio if isinstance(relatorio, (int, float)) else None
+
+# Itens da configuração (sessões, processos, servidor...) em que o relatório difere da baseline
+def diferencas_configuracao(relatorio, baseline):
+    atual, anterior = relatorio["configuracao"], baseline.get("configuracao", {})
+    return sorted(chave for chave in atual.keys() | anterior.keys() if atual.get(chave) != anterior.get(chave))
+
+# Compara com a baseline; devolve as métricas que pioraram além da tolerância. Nos tempos, a piora
+# também precisa passar da tolerância absoluta (nos reruns de dezenas de ms, 20% é ruído)
+def comparar(relatorio, baseline, tolerancia, tolerancia_absoluta):
+    regressoes = []
+    for caminho, maior_melhor in METRICAS_COMPARADAS.items():
+        atual, anterior = valor(relatorio, caminho), valor(baseline, caminho)
+        if not atual or not anterior:
+            continue
+        variacao = (atual - anterior) / anterior
+        piorou = -variacao > tolerancia if maior_melhor else variacao > tolerancia
+        if "_s." in caminho and abs(atual - anterior) <= tolerancia_absoluta:
+            piorou = False
+        print(f"{caminho}: {anterior} -> {atual} ({variacao:+.1%}){'  REGRESSÃO' if piorou else ''}")
+        if piorou:
+            regressoes.append(caminho)
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do MuscleGainer com AppTest e OpenRouter simulado")
+    parser.add_argument("--sessoes", type=int, default=8)
+    parser.add_argument("--processos", type=int, default=PROCESSOS_PADRAO, help="processos com sessões simultâneas")
+    parser.add_argument("--reruns", type=int, default=3, help="interações medidas por sessão depois da geração")
+    parser.add_argument("--perfis-iguais", action="store_true", help="todas as sessões enviam o mesmo perfil (cache/coalescência)")
+    parser.add_argument("--latencia", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--atraso-trecho", type=float, default=0.01, help="segundos entre trechos do stream")
+    parser.add_argument("--sem-streaming", action="store_true", help="o app pede a resposta inteira (OPENROUTER_STREAMING=0)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--salvar-baseline", metavar="NOME", help="grava o resultado em benchmarks/baselines/NOME.json")
+    parser.add_argument("--baseline", metavar="NOME", help="compara com benchmarks/baselines/NOME.json")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita antes de acusar regressão")
+    parser.add_argument("--tolerancia-absoluta", type=float, default=0.05, help="piora aceita nos tempos, em segundos")
+    args = parser.parse_args()
+
+    relatorio = executar_carga(
+        args.sessoes,
+        args.processos,
+        not args.perfis_iguais,
+        args.reruns,
+        args.timeout,
+        {"latencia": args.latencia, "jitter": args.jitter, "taxa_erro": args.taxa_erro, "atraso_trecho": args.atraso_trecho},
+        streaming=not args.sem_streaming,
+    )
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+    if args.salvar_baseline:
+        DIRETORIO_BASELINES.mkdir(exist_ok=True)
+        caminho = DIRETORIO_BASELINES / f"{args.salvar_baseline}.json"
+        caminho.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"baseline gravada em {caminho}")
+
+    if args.baseline:
+        baseline = json.loads((DIRETORIO_BASELINES / f"{args.baseline}.json").read_text(encoding="utf-8"))
+        diferencas = diferencas_configuracao(relatorio, baseline)
+        if diferencas:
+            # Números de outra configuração não dizem nada sobre regressão
+            for chave in diferencas:
+                print(f"configuração diferente da baseline em {chave}: {baseline.get('configuracao', {}).get(chave)} -> {relatorio['configuracao'][chave]}")
+            sys.exit(2)
+        if comparar(relatorio, baseline, args.tolerancia, args.tolerancia_absoluta):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor local que imita o endpoint de chat completions do OpenRouter
+# (latência com cauda lenta, erros, limite de taxa com 429 e streaming SSE configuráveis)
+
+TEXTO_PADRAO = (
+    "## Plano gerado pelo servidor de teste\n\n"
+    "### Segunda\n- Supino reto: 4x10\n- Remada curvada: 4x10\n\n"
+    "### Refeições\n- Café da manhã: ovos, aveia e banana\n- Almoço: arroz, feijão e frango\n"
+)
+
+class ServidorMock(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, latencia=0.0, jitter=0.0, taxa_erro=0.0, status_erro=503,
+                 falhas_iniciais=0, limite_rpm=0.0, rajada=5, atraso_trecho=0.0, texto=TEXTO_PADRAO,
+                 prob_lentidao=0.0, atraso_lentidao=0.0):
+        super().__init__(endereco, ManipuladorMock)
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.status_erro = status_erro
+        self.falhas_iniciais = falhas_iniciais
+        self.limite_rpm = limite_rpm
+        self.rajada = rajada
+        self.atraso_trecho = atraso_trecho
+        self.texto = texto
+        # Fração das respostas que leva `atraso_lentidao` segundos a mais (cauda de latência)
+        self.prob_lentidao = prob_lentidao
+        self.atraso_lentidao = atraso_lentidao
+        self.contadores = Counter()
+        self._lock = threading.Lock()
+        self.reiniciar_limite()
+
+    # Clientes que desistem no meio (timeouts, fim do benchmark) não são erro do servidor
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/api/v1/chat/completions"
+
+    def reiniciar_limite(self):
+        self._fichas = self.rajada
+        self._ultima_recarga = time.monotonic()
+
+    # Decide o status da próxima resposta (None = sucesso)
+    def sortear_falha(self):
+        with self._lock:
+            self.contadores["requisicoes"] += 1
+            if self.contadores["requisicoes"] <= self.falhas_iniciais:
+                return self.status_erro
+            # Limite de taxa do upstream como token bucket
+            if self.limite_rpm:
+                agora = time.monotonic()
+                self._fichas = min(self.rajada, self._fichas + (agora - self._ultima_recarga) * self.limite_rpm / 60)
+                self._ultima_recarga = agora
+                if self._fichas < 1:
+                    return 429
+                self._fichas -= 1
+            if random.random() < self.taxa_erro:
+                return self.status_erro
+            return None
+
+class ManipuladorMock(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        servidor = self.server
+        status = servidor.sortear_falha()
+        if status is not None:
+            servidor.contadores[f"status_{status}"] += 1
+            self._responder_json(status, {"error": {"message": f"Erro simulado {status}", "code": status}}, {"Retry-After": "1"} if status == 429 else {})
+            return
+
+        atraso = servidor.latencia + random.uniform(0, servidor.jitter)
+        if random.random() < servidor.prob_lentidao:
+            servidor.contadores["lentas"] += 1
+            atraso += servidor.atraso_lentidao
+        time.sleep(atraso)
+        servidor.contadores["status_200"] += 1
+        texto = servidor.texto
+        uso = {
+            "prompt_tokens": sum(len(m.get("content", "").split()) for m in corpo.get("messages", [])),
+            "completion_tokens": len(texto.split()),
+        }
+        if corpo.get("stream"):
+            self._responder_stream(texto, corpo.get("model", "mock"), uso)
+        else:
+            self._responder_json(200, {
+                "model": corpo.get("model", "mock"),
+                "choices": [{"message": {"role": "assistant", "content": texto}}],
+                "usage": uso,
+            })
+
+    def _responder_json(self, status, dados, cabecalhos=None):
+        conteudo = json.dumps(dados).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def _responder_stream(self, texto, modelo, uso):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+        for palavra in texto.split(" "):
+            evento = {"model": modelo, "choices": [{"delta": {"content": palavra + " "}}]}
+            self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.atraso_trecho)
+        evento = {"model": modelo, "choices": [{"delta": {}}], "usage": uso}
+        self.wfile.write(f"data: {json.dumps(evento)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.close_connection = True
+
+# Sobe o servidor numa thread daemon (porta 0 = porta livre qualquer)
+def iniciar_servidor(porta=0, **configuracao):
+    servidor = ServidorMock(("127.0.0.1", porta), **configuracao)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o OpenRouter")
+    parser.add_argument("--porta", type=int, default=8911)
+    parser.add_argument("--latencia", type=float, default=0.5, help="segundos até a primeira resposta")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--status-erro", type=int, default=503)
+    parser.add_argument("--falhas-iniciais", type=int, default=0)
+    parser.add_argument("--limite-rpm", type=float, default=0.0, help="acima disso responde 429 (0 = sem limite)")
+    parser.add_argument("--rajada", type=int, default=5)
+    parser.add_argument("--atraso-trecho", type=float, default=0.02, help="segundos entre trechos do stream")
+    parser.add_argument("--prob-lentidao", type=float, default=0.0, help="fração das respostas com atraso extra")
+    parser.add_argument("--atraso-lentidao", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor = ServidorMock(
+        ("127.0.0.1", args.porta),
+        latencia=args.latencia,
+        jitter=args.jitter,
+        taxa_erro=args.taxa_erro,
+        status_erro=args.status_erro,
+        falhas_iniciais=args.falhas_iniciais,
+        limite_rpm=args.limite_rpm,
+        rajada=args.rajada,
+        atraso_trecho=args.atraso_trecho,
+        prob_lentidao=args.prob_lentidao,
+        atraso_lentidao=args.atraso_lentidao,
+    )
+    print(f"OPENROUTER_URL={servidor.url}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print(dict(servidor.contadores))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Perfil de importação do caminho até a primeira renderização da página: resume a saída de
+# `python -X importtime` (de um processo novo ou de um log já capturado, ex.: um container
+# iniciado com PYTHONPROFILEIMPORTTIME=1) e verifica o orçamento de tempo da partida a frio
+
+APP = RAIZ / "massa_muscular.py"
+
+# Dependências que não podem estar no caminho até a primeira renderização (o Streamlit importa
+# stubs de algumas delas, como o plotly, por isso vale o tempo gasto e não a simples presença)
+MODULOS_PESADOS = (
+    "numpy", "pandas", "pyarrow", "matplotlib", "plotly", "langchain_core",
+    "together", "openai", "huggingface_hub", "requests", "tenacity", "reportlab", "sqlalchemy",
+)
+LIMITE_PESADO_MS = 10
+
+# Executado em um processo novo (com -X importtime): importa o Streamlit e roda a página uma vez,
+# sem o aquecimento em segundo plano, e informa os tempos
+CODIGO_PRIMEIRA_RENDERIZACAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import streamlit
+importacao_streamlit = time.perf_counter() - inicio
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+inicio = time.perf_counter()
+at.run()
+primeira_execucao = time.perf_counter() - inicio
+print(json.dumps({
+    "importacao_streamlit_s": importacao_streamlit,
+    "primeira_execucao_s": primeira_execucao,
+    "excecoes": len(at.exception),
+}))
+"""
+
+# Módulos importados no nível do script da página (os imports dentro de funções são adiados)
+def modulos_da_pagina(caminho=APP):
+    arvore = ast.parse(Path(caminho).read_text(encoding="utf-8"))
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos.extend(alias.name for alias in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module:
+            modulos.append(no.module)
+    return modulos
+
+# Linhas "import time: self [us] | cumulative | imported package"; a indentação do nome dá o nível
+def ler_importtime(linhas):
+    registros = []
+    for linha in linhas:
+        if not linha.startswith("import time:") or "imported package" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        nome = nome.rstrip("\n")
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        registros.append({"modulo": nome.strip(), "proprio_us": int(proprio), "acumulado_us": int(acumulado), "nivel": nivel})
+    return registros
+
+def executar_com_importtime(*argumentos, **ambiente):
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", *argumentos],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(RAIZ), **ambiente},
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(processo.stderr[-2000:])
+    return processo.stdout, ler_importtime(processo.stderr.splitlines())
+
+def perfil_importacoes(modulos):
+    _, registros = executar_com_importtime("-c", "; ".join(f"import {modulo}" for modulo in modulos))
+    return registros
+
+def primeira_renderizacao():
+    saida, registros = executar_com_importtime("-c", CODIGO_PRIMEIRA_RENDERIZACAO, str(APP), AQUECER_IMPORTACOES="0")
+    return json.loads(saida.splitlines()[-1]), registros
+
+def resumir(registros, top):
+    topo = min(registro["nivel"] for registro in registros)
+    diretos = [registro for registro in registros if registro["nivel"] == topo]
+    print(f"importações: {sum(r['acumulado_us'] for r in diretos) / 1000:.1f} ms em {len(registros)} módulos")
+    print("maiores (acumulado, importados diretamente):")
+    for registro in sorted(diretos, key=lambda r: r["acumulado_us"], reverse=True)[:top]:
+        print(f"  {registro['acumulado_us'] / 1000:8.1f} ms  {registro['modulo']}")
+    print("maiores (tempo próprio):")
+    for registro in sorted(registros, key=lambda r: r["proprio_us"], reverse=True)[:top]:
+        print(f"  {registro['proprio_us'] / 1000:8.1f} ms  {registro['modulo']}")
+
+# Tempo acumulado de cada dependência pesada importada, quando passa do limite
+def pesados(registros):
+    custos = {}
+    for registro in registros:
+        if registro["modulo"] in MODULOS_PESADOS:
+            custos[registro["modulo"]] = max(custos.get(registro["modulo"], 0), registro["acumulado_us"] / 1000)
+    return {modulo: custo for modulo, custo in sorted(custos.items()) if custo > LIMITE_PESADO_MS}
+
+def descrever(custos):
+    return ", ".join(f"{modulo} ({custo:.0f} ms)" for modulo, custo in custos.items())
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de importação e orçamento da primeira renderização")
+    parser.add_argument("--arquivo", help="resume um log com a saída de -X importtime em vez de medir")
+    parser.add_argument("--modulos", nargs="+", help="módulos a importar (padrão: os importados pela página)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--orcamento-ms", type=float, default=1000, help="limite da importação do Streamlit + primeira execução da página")
+    args = parser.parse_args()
+
+    if args.arquivo:
+        with open(args.arquivo, encoding="utf-8", errors="replace") as arquivo:
+            resumir(ler_importtime(arquivo), args.top)
+        return
+
+    modulos = args.modulos or modulos_da_pagina()
+    registros = perfil_importacoes(modulos)
+    resumir(registros, args.top)
+    if args.modulos:
+        return
+
+    falhas = []
+    carregados = pesados(registros)
+    if carregados:
+        falhas.append(f"dependências pesadas importadas pela página: {descrever(carregados)}")
+
+    resultado, registros = primeira_renderizacao()
+    caminho_critico = (resultado["importacao_streamlit_s"] + resultado["primeira_execucao_s"]) * 1000
+    print(
+        f"primeira renderização: {caminho_critico:.0f} ms (Streamlit {resultado['importacao_streamlit_s'] * 1000:.0f} ms "
+        f"+ página {resultado['primeira_execucao_s'] * 1000:.0f} ms), orçamento {args.orcamento_ms:.0f} ms"
+    )
+    carregados = pesados(registros)
+    if carregados:
+        falhas.append(f"dependências pesadas carregadas na primeira renderização: {descrever(carregados)}")
+    if resultado["excecoes"]:
+        falhas.append(f"{resultado['excecoes']} exceções na primeira renderização")
+    if caminho_critico > args.orcamento_ms:
+        falhas.append(f"primeira renderização acima do orçamento ({caminho_critico:.0f} ms > {args.orcamento_ms:.0f} ms)")
+
+    for falha in falhas:
+        print(f"FALHA: {falha}")
+    if falhas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import streamlit as st
+import zstandard
+from cachetools import TTLCache
+
+from instrumentacao import registrar_coletor
+
+# Granularidade usada para agrupar perfis parecidos na mesma entrada do cache
+GRANULARIDADES = {
+    "idade": float(os.environ.get("CACHE_GRANULARIDADE_IDADE", "1")),
+    "peso": float(os.environ.get("CACHE_GRANULARIDADE_PESO", "1")),
+    "altura": float(os.environ.get("CACHE_GRANULARIDADE_ALTURA", "1")),
+    "medidas": float(os.environ.get("CACHE_GRANULARIDADE_MEDIDAS", "1")),
+}
+CACHE_TAMANHO_MAXIMO = int(os.environ.get("CACHE_TAMANHO_MAXIMO", "1024"))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "86400"))
+# Diretório da camada em disco (vazio desativa a camada)
+CACHE_DIRETORIO = os.environ.get("CACHE_DIRETORIO", "")
+
+# Campos de dados_usuario que entram no prompt e, portanto, na chave do cache
+CAMPOS_CHAVE = (
+    "sexo", "idade", "peso", "altura", "medidas", "membros_foco", "tipo_treino", "nivel", "dias_treino", "restricoes",
+)
+
+def arredondar(valor, granularidade):
+    if not granularidade:
+        return valor
+    resultado = round(round(valor / granularidade) * granularidade, 4)
+    if isinstance(valor, int) and float(resultado).is_integer():
+        return int(resultado)
+    return resultado
+
+# Perfil com os valores numéricos agrupados; o prompt é montado a partir dele
+def normalizar_perfil(dados_usuario):
+    perfil = dict(dados_usuario)
+    for campo in ("idade", "peso", "altura"):
+        perfil[campo] = arredondar(dados_usuario[campo], GRANULARIDADES[campo])
+    perfil["medidas"] = {
+        parte: arredondar(medida, GRANULARIDADES["medidas"])
+        for parte, medida in dados_usuario["medidas"].items()
+    }
+    perfil["membros_foco"] = sorted(dados_usuario["membros_foco"])
+    if "restricoes" in dados_usuario:
+        perfil["restricoes"] = sorted(dados_usuario["restricoes"])
+    return perfil
+
+# `formato` separa os planos estruturados dos em markdown (sem ele, a chave é a de sempre)
+def chave_cache(perfil, tipo_recomendacao, formato=None):
+    conteudo = json.dumps(
+        [tipo_recomendacao, {campo: perfil.get(campo) for campo in CAMPOS_CHAVE}, *([formato] if formato else [])],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+# TTLCache que avisa quando uma entrada sai por falta de espaço ou por expirar
+class _TTLCacheContado(TTLCache):
+    def __init__(self, maxsize, ttl, contadores):
+        super().__init__(maxsize, ttl)
+        self._contadores = contadores
+
+    def popitem(self):
+        item = super().popitem()
+        self._contadores["remocoes"] += 1
+        return item
+
+    def expire(self, time=None):
+        expirados = super().expire(time)
+        self._contadores["expiracoes"] += len(expirados)
+        return expirados
+
+# Prefixo dos valores em bytes (planos estruturados) nos arquivos em disco; textos nunca começam com NUL
+MARCA_BYTES = b"\x00"
+
+# Cache em duas camadas: LRU/TTL em memória e, opcionalmente, arquivos zstd em disco.
+# Os valores são textos (markdown) ou bytes (planos estruturados)
+class CacheRecomendacoes:
+    def __init__(self, tamanho_maximo=CACHE_TAMANHO_MAXIMO, ttl=CACHE_TTL, diretorio=CACHE_DIRETORIO):
+        self.ttl = ttl
+        self.contadores = Counter()
+        self._memoria = _TTLCacheContado(tamanho_maximo, ttl, self.contadores)
+        self._lock = threading.Lock()
+        self._diretorio = Path(diretorio) if diretorio else None
+
+    def obter(self, chave):
+        with self._lock:
+            texto = self._memoria.get(chave)
+            if texto is not None:
+                self.contadores["acertos_memoria"] += 1
+                return texto
+
+        texto = self._ler_disco(chave)
+        with self._lock:
+            if texto is None:
+                self.contadores["falhas"] += 1
+                return None
+            self.contadores["acertos_disco"] += 1
+            self._memoria[chave] = texto
+        return texto
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._memoria[chave] = valor
+        self._gravar_disco(chave, valor)
+
+    def estatisticas(self):
+        with self._lock:
+            return {**self.contadores, "entradas_memoria": len(self._memoria)}
+
+    def _caminho(self, chave):
+        return self._diretorio / chave[:2] / f"{chave}.zst"
+
+    def _ler_disco(self, chave):
+        if self._diretorio is None:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            if time.time() - caminho.stat().st_mtime > self.ttl:
+                caminho.unlink(missing_ok=True)
+                with self._lock:
+                    self.contadores["expiracoes"] += 1
+                return None
+            dados = zstandard.decompress(caminho.read_bytes())
+            return dados[len(MARCA_BYTES):] if dados.startswith(MARCA_BYTES) else dados.decode("utf-8")
+        except (OSError, zstandard.ZstdError):
+            return None
+
+    def _gravar_disco(self, chave, valor):
+        if self._diretorio is None:
+            return
+        caminho = self._caminho(chave)
+        # A camada em disco é só uma otimização; falhas de escrita não devem derrubar a geração
+        with contextlib.suppress(OSError):
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            temporario = caminho.with_suffix(f".{threading.get_ident()}.tmp")
+            dados = MARCA_BYTES + valor if isinstance(valor, bytes) else valor.encode("utf-8")
+            temporario.write_bytes(zstandard.compress(dados))
+            os.replace(temporario, caminho)
+
+# Instância única compartilhada por todas as sessões do servidor
+@st.cache_resource
+def obter_cache_recomendacoes():
+    cache = CacheRecomendacoes()
+    registrar_coletor("cache", cache.estatisticas)
+    return cache
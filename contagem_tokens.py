@@ -0,0 +1,49 @@
+import math
+import os
+import threading
+
+from instrumentacao import contar
+
+# Tokenizador usado na contagem (id no Hugging Face Hub ou caminho de um tokenizer.json; vazio = só estimativa)
+TOKENIZADOR = os.environ.get("TOKENIZADOR", "Qwen/Qwen2.5-VL-72B-Instruct")
+# Estimativa usada enquanto o tokenizador não carregou (ou se não puder ser carregado)
+CARACTERES_POR_TOKEN = 3.5
+# Tokens do template de chat acrescentados a cada mensagem
+TOKENS_POR_MENSAGEM = 4
+
+_tokenizador = None
+_carregamento_iniciado = False
+_lock = threading.Lock()
+
+def _carregar_tokenizador():
+    global _tokenizador
+    try:
+        from tokenizers import Tokenizer
+
+        if os.path.exists(TOKENIZADOR):
+            _tokenizador = Tokenizer.from_file(TOKENIZADOR)
+        else:
+            _tokenizador = Tokenizer.from_pretrained(TOKENIZADOR)
+    except Exception as e:
+        # Sem rede ou sem o arquivo: a contagem segue pela estimativa
+        contar("tokenizador_indisponivel", motivo=type(e).__name__)
+
+# O download do Hub pode levar vários segundos, então o carregamento roda em uma thread
+# e nunca bloqueia quem está contando
+def _obter_tokenizador():
+    global _carregamento_iniciado
+    if not _carregamento_iniciado and TOKENIZADOR:
+        with _lock:
+            if not _carregamento_iniciado:
+                _carregamento_iniciado = True
+                threading.Thread(target=_carregar_tokenizador, daemon=True, name="tokenizador").start()
+    return _tokenizador
+
+def contar_tokens(texto):
+    tokenizador = _obter_tokenizador()
+    if tokenizador is None:
+        return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+    return len(tokenizador.encode(texto, add_special_tokens=False).ids)
+
+def contar_tokens_mensagens(mensagens):
+    return sum(contar_tokens(mensagem["content"]) + TOKENS_POR_MENSAGEM for mensagem in mensagens)
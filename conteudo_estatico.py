@@ -0,0 +1,110 @@
+# Conteúdo fixo da página, montado uma única vez na importação: cada rerun só envia
+# os textos prontos, em poucos elementos (CSS e cabeçalho juntos, seções da tela inicial agrupadas)
+
+# Estilo CSS personalizado, título e subtítulo
+CABECALHO = """
+<style>
+    .main {
+        padding: 2rem;
+    }
+    .title {
+        font-size: 2.5rem;
+        font-weight: bold;
+        color: #3366cc;
+        margin-bottom: 2rem;
+        text-align: center;
+    }
+    .subtitle {
+        font-size: 1.5rem;
+        color: #555;
+        margin-bottom: 1rem;
+    }
+    .info-box {
+        background-color: #f0f2f6;
+        padding: 1rem;
+        border-radius: 10px;
+        margin-bottom: 1rem;
+    }
+    .result-section {
+        background-color: #e6f3ff;
+        padding: 1.5rem;
+        border-radius: 10px;
+        margin-top: 2rem;
+    }
+</style>
+<div class="title">MuscleGainer App</div>
+<div class="subtitle">Seu assistente pessoal para ganho de massa muscular</div>
+"""
+
+SUBTITULO_RESULTADOS = '<div class="subtitle">Suas recomendações personalizadas</div>'
+
+DICAS = """
+- **Consistência é a chave:** Siga o plano por pelo menos 8-12 semanas para ver resultados significativos.
+- **Progressão:** Aumente gradualmente a carga nos exercícios conforme sua força aumenta.
+- **Descanso:** Garanta 7-9 horas de sono por noite para maximizar a recuperação muscular.
+- **Hidratação:** Beba pelo menos 35ml de água por kg de peso corporal diariamente.
+- **Monitoramento:** Faça novas medidas a cada 4 semanas para acompanhar seu progresso.
+"""
+
+AVISO_PROFISSIONAL = """
+**Importante:** Este plano é uma sugestão baseada nas informações fornecidas.
+Para resultados ótimos e seguros, consulte um nutricionista e um profissional de educação física.
+"""
+
+# Tela inicial, exibida enquanto não há resultados
+CONVITE = "👈 Por favor, preencha suas informações na aba 'Informações do Usuário' e clique em 'Gerar Recomendações' para visualizar seus resultados personalizados."
+
+COMO_FUNCIONA = """
+## Como funciona o MuscleGainer App
+
+Este aplicativo foi projetado para ajudar você a atingir seus objetivos de ganho de massa muscular, oferecendo:
+
+1. **Plano alimentar personalizado** - Com base nas suas características físicas e objetivos
+2. **Programa de treino específico** - Focado nos grupos musculares que você deseja desenvolver
+3. **Opções adaptáveis** - Com ou sem equipamentos de musculação
+4. **Métricas úteis** - Cálculos de IMC, gordura corporal estimada e necessidades calóricas
+
+Ao preencher seus dados na aba anterior, nosso sistema irá gerar recomendações personalizadas para você.
+"""
+
+# Uma entrada por coluna
+BENEFICIOS_E_FATORES = (
+    """
+### Benefícios do ganho de massa muscular
+- Aumento da força e resistência física
+- Melhora do metabolismo e queima calórica
+- Prevenção de lesões e melhora da postura
+- Aumento da densidade óssea
+- Melhora da autoestima e confiança
+""",
+    """
+### Fatores importantes para hipertrofia
+- **Volume de treino adequado** - Número de séries e repetições
+- **Intensidade progressiva** - Aumento gradual das cargas
+- **Alimentação rica em proteínas** - Para reconstrução muscular
+- **Descanso adequado** - Recuperação entre treinos
+- **Consistência** - Manter a rotina a longo prazo
+""",
+)
+
+TITULO_GRUPOS_MUSCULARES = "### Principais Grupos Musculares"
+
+GRUPOS_MUSCULARES = (
+    """
+#### Peito, Costas e Ombros
+O desenvolvimento destes músculos contribui para uma postura melhor e uma aparência mais larga e atlética.
+""",
+    """
+#### Braços e Pernas
+Braços fortes e pernas desenvolvidas são fundamentais para um físico equilibrado e funcional, além de melhorar o desempenho em atividades diárias.
+""",
+    """
+#### Glúteos
+Os glúteos são um dos maiores grupos musculares do corpo. Seu fortalecimento melhora a estabilidade pélvica, potência de salto e corrida, além dos benefícios estéticos.
+""",
+)
+
+RODAPE = """
+---
+MuscleGainer App | Desenvolvido para ajudar você a atingir seus objetivos de ganho de massa muscular
+"""
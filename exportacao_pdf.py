@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import streamlit as st
+from cachetools import LRUCache
+
+from instrumentacao import cronometrado, registrar_coletor
+
+# Exportação em PDF (métricas + plano alimentar + programa de treino), gerada em um pool próprio
+# e guardada pelo hash do conteúdo: reruns e sessões com os mesmos textos reaproveitam os bytes
+PDF_TRABALHADORES = int(os.environ.get("PDF_TRABALHADORES", "2"))
+PDF_CACHE_TAMANHO = int(os.environ.get("PDF_CACHE_TAMANHO", "256"))
+# Intervalo entre as consultas da página a um PDF ainda em renderização
+PDF_INTERVALO_CONSULTA = float(os.environ.get("PDF_INTERVALO_CONSULTA", "0.5"))
+# Uma renderização que falhou é devolvida com o mesmo erro até passar esse tempo, em vez de refeita a cada rerun
+PDF_ESPERA_NOVA_TENTATIVA = float(os.environ.get("PDF_ESPERA_NOVA_TENTATIVA", "60"))
+
+AVISO_PDF = (
+    "Este plano é uma sugestão baseada nas informações fornecidas. Para resultados ótimos e seguros, "
+    "consulte um nutricionista e um profissional de educação física."
+)
+
+def chave_pdf(dieta, treino, metricas):
+    conteudo = json.dumps([dieta, treino, metricas], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+# As fontes padrão do PDF só cobrem o cp1252 (emojis e afins são descartados)
+def _texto_pdf(texto):
+    return texto.encode("cp1252", "ignore").decode("cp1252")
+
+# Negrito, itálico e código do markdown para a marcação de parágrafos do reportlab
+# (o ***negrito e itálico*** vem antes, senão as regras abaixo fecham as tags fora de ordem)
+def _inline(texto):
+    texto = escape(_texto_pdf(texto))
+    texto = re.sub(r"\*\*\*(.+?)\*\*\*|___(.+?)___", lambda m: f"<b><i>{m.group(1) or m.group(2)}</i></b>", texto)
+    texto = re.sub(r"\*\*(.+?)\*\*|__(.+?)__", lambda m: f"<b>{m.group(1) or m.group(2)}</b>", texto)
+    texto = re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\w)", r"<i>\1</i>", texto)
+    texto = re.sub(r"`(.+?)`", r'<font face="Courier">\1</font>', texto)
+    return texto
+
+# Parágrafo com a marcação do markdown; se ela ainda sair malformada (asteriscos cruzados e afins),
+# o trecho vai como texto simples em vez de derrubar o PDF inteiro
+def _paragrafo(texto, estilo, **opcoes):
+    from reportlab.platypus import Paragraph
+
+    try:
+        return Paragraph(_inline(texto), estilo, **opcoes)
+    except ValueError:
+        return Paragraph(escape(_texto_pdf(texto)), estilo, **opcoes)
+
+# Tabela do markdown; None quando só há linhas separadoras
+def _tabela(linhas, estilos):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    celulas = []
+    for linha in linhas:
+        campos = [campo.strip() for campo in linha.strip().strip("|").split("|")]
+        # Linha separadora do cabeçalho (|---|:---:|)
+        if all(re.fullmatch(r":?-+:?", campo) for campo in campos if campo):
+            continue
+        celulas.append([_paragrafo(campo, estilos["BodyText"]) for campo in campos])
+    if not celulas:
+        return None
+    colunas = max(len(linha) for linha in celulas)
+    celulas = [linha + [""] * (colunas - len(linha)) for linha in celulas]
+    tabela = Table(celulas, repeatRows=1)
+    tabela.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e6f3ff")),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    return tabela
+
+# Converte o markdown das recomendações (títulos, listas, tabelas e parágrafos) em flowables
+def _markdown_para_flowables(texto, estilos):
+    from reportlab.platypus import HRFlowable, Spacer
+
+    flowables = []
+    paragrafo = []
+    tabela = []
+
+    def descarregar():
+        if paragrafo:
+            flowables.append(_paragrafo(" ".join(paragrafo), estilos["BodyText"]))
+            paragrafo.clear()
+        if tabela:
+            flowable = _tabela(tabela, estilos)
+            if flowable is not None:
+                flowables.extend((flowable, Spacer(1, 6)))
+            tabela.clear()
+
+    for linha in texto.splitlines():
+        linha = linha.strip()
+        if linha.startswith("|"):
+            if paragrafo:
+                descarregar()
+            tabela.append(linha)
+            continue
+        if tabela:
+            descarregar()
+        titulo = re.match(r"(#{1,6})\s+(.*)", linha)
+        item = re.match(r"([-*+]|\d+[.)])\s+(.*)", linha)
+        if not linha:
+            descarregar()
+        elif titulo:
+            descarregar()
+            nivel = min(len(titulo.group(1)) + 1, 4)
+            flowables.append(_paragrafo(titulo.group(2), estilos[f"Heading{nivel}"]))
+        elif re.fullmatch(r"(-{3,}|\*{3,}|_{3,})", linha):
+            descarregar()
+            flowables.append(HRFlowable(width="100%", color="#cccccc"))
+        elif item:
+            descarregar()
+            marcador = "•" if item.group(1) in "-*+" else item.group(1)
+            flowables.append(_paragrafo(item.group(2), estilos["BodyText"], bulletText=marcador))
+        else:
+            paragrafo.append(linha)
+    descarregar()
+    return flowables
+
+@cronometrado("renderizacao_pdf")
+def renderizar_pdf(dieta, treino, metricas):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table
+
+    estilos = getSampleStyleSheet()
+    estilos["BodyText"].bulletIndent = 6
+    estilos["BodyText"].leftIndent = 0
+    buffer = BytesIO()
+    documento = SimpleDocTemplate(
+        buffer, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        title="MuscleGainer App - Plano personalizado",
+    )
+
+    elementos = [
+        Paragraph("MuscleGainer App", estilos["Title"]),
+        Paragraph(f"Plano personalizado gerado em {datetime.now().strftime('%d/%m/%Y')}", estilos["Italic"]),
+        Spacer(1, 12),
+        Paragraph("Métricas", estilos["Heading2"]),
+        Table(
+            [[Paragraph(f"<b>{_inline(rotulo)}</b>", estilos["BodyText"]), _texto_pdf(valor)] for rotulo, valor in metricas.items()],
+            hAlign="LEFT",
+        ),
+        Spacer(1, 12),
+        *_markdown_para_flowables(dieta, estilos),
+        PageBreak(),
+        *_markdown_para_flowables(treino, estilos),
+        Spacer(1, 18),
+        Paragraph(f"<b>Importante:</b> {_inline(AVISO_PDF)}", estilos["Italic"]),
+    ]
+    documento.build(elementos)
+    return buffer.getvalue()
+
+class ExportadorPdf:
+    def __init__(self, trabalhadores=PDF_TRABALHADORES, tamanho_cache=PDF_CACHE_TAMANHO):
+        self.contadores = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="pdf")
+        # (Futuro, instante do envio) de cada PDF pelo hash do conteúdo (em andamento, pronto ou com erro)
+        self._futuros = LRUCache(maxsize=tamanho_cache)
+        self._lock = threading.Lock()
+
+    # Devolve o futuro com os bytes do PDF, enfileirando a renderização só na primeira vez
+    # (ou de novo quando a anterior falhou há mais que PDF_ESPERA_NOVA_TENTATIVA)
+    def solicitar(self, dieta, treino, metricas):
+        chave = chave_pdf(dieta, treino, metricas)
+        agora = time.monotonic()
+        with self._lock:
+            futuro, enviado = self._futuros.get(chave, (None, None))
+            if futuro is not None:
+                falhou = futuro.done() and futuro.exception() is not None
+                if not falhou:
+                    self.contadores["reaproveitados"] += 1
+                    return futuro
+                if agora - enviado < PDF_ESPERA_NOVA_TENTATIVA:
+                    self.contadores["falhas_reaproveitadas"] += 1
+                    return futuro
+            futuro = self._executor.submit(renderizar_pdf, dieta, treino, metricas)
+            self._futuros[chave] = (futuro, agora)
+            self.contadores["renderizados"] += 1
+            return futuro
+
+    def estatisticas(self):
+        with self._lock:
+            return {**self.contadores, "entradas": len(self._futuros)}
+
+# Instância única compartilhada por todas as sessões do servidor
+@st.cache_resource
+def obter_exportador_pdf():
+    exportador = ExportadorPdf()
+    registrar_coletor("pdf", exportador.estatisticas)
+    return exportador
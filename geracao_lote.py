@@ -0,0 +1,315 @@
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import openrouter
+from cache_recomendacoes import chave_cache, normalizar_perfil, obter_cache_recomendacoes
+from instrumentacao import contar, percentil
+from limitador import LimitadorTaxa
+from planos import gerar_fallback_estruturado, texto_para_plano
+from recomendacoes import PLANOS_ESTRUTURADOS, gerar_fallback, montar_payload_llm
+
+# Geração em lote, sem Streamlit: lê perfis (mesmo formato de dados_usuario) de JSONL/CSV,
+# gera dieta e treino com concorrência limitada e grava cada perfil assim que termina
+
+TIPOS_RECOMENDACAO = {"dieta": "dieta", "treino": "programa de treino"}
+CAMPOS_LISTA = ("membros_foco", "restricoes")
+CAMPOS_NUMERICOS = ("idade", "peso", "altura", "dias_treino")
+
+def _converter_numero(valor):
+    try:
+        return int(valor)
+    except ValueError:
+        return float(valor)
+
+# No CSV, medidas vêm como JSON e listas separadas por ";"
+def _perfil_de_linha_csv(linha):
+    perfil = dict(linha)
+    for campo in CAMPOS_NUMERICOS:
+        if perfil.get(campo):
+            perfil[campo] = _converter_numero(perfil[campo])
+    for campo in CAMPOS_LISTA:
+        perfil[campo] = [item.strip() for item in (perfil.get(campo) or "").split(";") if item.strip()]
+    perfil["medidas"] = json.loads(perfil.get("medidas") or "{}")
+    return perfil
+
+# Uma linha que não dá para ler vira um perfil só com o id e o erro, gravado como erro na saída
+def ler_perfis(caminho):
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if Path(caminho).suffix == ".csv":
+            linhas, converter = csv.DictReader(arquivo), _perfil_de_linha_csv
+        else:
+            linhas, converter = (linha for linha in arquivo if linha.strip()), json.loads
+        for indice, linha in enumerate(linhas):
+            try:
+                perfil = converter(linha)
+                # JSON válido que não é um objeto (lista, número, string) também não é um perfil
+                if not isinstance(perfil, dict):
+                    raise ValueError(f"Esperado um objeto JSON, recebido {type(perfil).__name__}")
+            except ValueError as e:
+                perfil = {"erro_leitura": str(e)}
+                if isinstance(linha, dict) and linha.get("id"):
+                    perfil["id"] = linha["id"]
+            perfil["id"] = str(perfil.get("id", indice))
+            yield perfil
+
+# Saída JSONL: uma linha por perfil, com flush a cada gravação
+class EscritorJsonl:
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._arquivo = None
+
+    def concluidos(self):
+        if not self.caminho.exists():
+            return set()
+        with open(self.caminho, encoding="utf-8") as arquivo:
+            ids = set()
+            for linha in arquivo:
+                try:
+                    ids.add(json.loads(linha)["id"])
+                except (ValueError, KeyError):
+                    # Última linha cortada por uma interrupção: o perfil será gerado de novo
+                    continue
+            return ids
+
+    def escrever(self, registro):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+# Tipos das colunas dos planos estruturados, espelhando os esquemas de planos.py
+_ALIMENTO = pa.struct([
+    ("nome", pa.string()),
+    ("quantidade", pa.string()),
+    ("kcal", pa.float64()),
+    ("proteinas_g", pa.float64()),
+    ("carboidratos_g", pa.float64()),
+    ("gorduras_g", pa.float64()),
+])
+_EXERCICIO = pa.struct([("nome", pa.string()), ("series", pa.int64()), ("repeticoes", pa.string()), ("descanso_s", pa.int64())])
+TIPOS_PLANO_PARQUET = {
+    "dieta": pa.struct([
+        ("calorias_diarias", pa.int64()),
+        ("proteinas_g", pa.int64()),
+        ("carboidratos_g", pa.int64()),
+        ("gorduras_g", pa.int64()),
+        ("refeicoes", pa.list_(pa.struct([("nome", pa.string()), ("alimentos", pa.list_(_ALIMENTO))]))),
+        ("observacoes", pa.list_(pa.string())),
+    ]),
+    "treino": pa.struct([
+        ("dias", pa.list_(pa.struct([("dia", pa.string()), ("foco", pa.string()), ("exercicios", pa.list_(_EXERCICIO))]))),
+        ("observacoes", pa.list_(pa.string())),
+    ]),
+}
+
+# Esquema fixo da saída: inferido de cada parte, uma parte sem erros teria as colunas erro_* como
+# null e as partes seguintes, com erros, como string, e o diretório deixaria de ser lido como uma tabela
+def esquema_parquet(estruturado):
+    campos = [pa.field("id", pa.string())]
+    for nome in TIPOS_RECOMENDACAO:
+        campos += [
+            pa.field(nome, TIPOS_PLANO_PARQUET[nome] if estruturado else pa.string()),
+            pa.field(f"origem_{nome}", pa.string()),
+            pa.field(f"erro_{nome}", pa.string()),
+            pa.field(f"latencia_{nome}_s", pa.float64()),
+        ]
+    return pa.schema(campos)
+
+# Saída Parquet: diretório com uma parte nova a cada `tamanho_parte` perfis
+class EscritorParquet:
+    def __init__(self, caminho, tamanho_parte=500, estruturado=False):
+        self.caminho = Path(caminho)
+        self.tamanho_parte = tamanho_parte
+        self.esquema = esquema_parquet(estruturado)
+        self._buffer = []
+
+    def concluidos(self):
+        partes = sorted(self.caminho.glob("parte-*.parquet"))
+        if not partes:
+            return set()
+        return set(pa.concat_tables(pq.read_table(parte, columns=["id"]) for parte in partes)["id"].to_pylist())
+
+    def escrever(self, registro):
+        self._buffer.append(registro)
+        if len(self._buffer) >= self.tamanho_parte:
+            self._descarregar()
+
+    def _descarregar(self):
+        if not self._buffer:
+            return
+        self.caminho.mkdir(parents=True, exist_ok=True)
+        numero = len(list(self.caminho.glob("parte-*.parquet")))
+        temporario = self.caminho / f".parte-{numero:05d}.tmp"
+        pq.write_table(pa.Table.from_pylist(self._buffer, schema=self.esquema), temporario)
+        temporario.rename(self.caminho / f"parte-{numero:05d}.parquet")
+        self._buffer = []
+
+    def fechar(self):
+        self._descarregar()
+
+def criar_escritor(caminho, tamanho_parte, estruturado=False):
+    if Path(caminho).suffix == ".jsonl":
+        return EscritorJsonl(caminho)
+    return EscritorParquet(caminho, tamanho_parte, estruturado)
+
+def _gerar_llm(perfil_normalizado, tipo_recomendacao, chave_api, sessao, limitador, timeout, estruturado):
+    # Cada tentativa (inclusive as retentativas) espera a sua ficha no limitador
+    resposta = openrouter.enviar_chat_completion(
+        montar_payload_llm(perfil_normalizado, tipo_recomendacao, estruturado),
+        chave_api,
+        sessao,
+        timeout=(openrouter.TIMEOUT_CONEXAO, timeout),
+        senha=limitador.entrar() if limitador is not None else None,
+    )
+    texto = resposta["choices"][0]["message"]["content"]
+    return texto_para_plano(tipo_recomendacao, texto) if estruturado else texto
+
+# Gera dieta e treino de um perfil; qualquer falha (perfil incompleto, upstream, resposta inválida)
+# vira fallback na própria linha, e o que nem o fallback consegue gerar é gravado com origem "erro".
+# Estruturados, os planos são gravados como objetos (colunas aninhadas no Parquet)
+def processar_perfil(perfil, chave_api, sessao, cache, limitador, timeout, estruturado=False):
+    registro = {"id": perfil["id"]}
+    perfil_normalizado = erro_perfil = None
+    try:
+        if "erro_leitura" in perfil:
+            raise ValueError(f"Linha inválida na entrada: {perfil['erro_leitura']}")
+        perfil_normalizado = normalizar_perfil(perfil)
+    except Exception as e:
+        erro_perfil = e
+    for nome, tipo_recomendacao in TIPOS_RECOMENDACAO.items():
+        inicio = time.perf_counter()
+        texto = None
+        origem = "cache"
+        erro = None
+        try:
+            if erro_perfil is not None:
+                raise erro_perfil
+            chave = chave_cache(perfil_normalizado, tipo_recomendacao, "json" if estruturado else None)
+            texto = cache.obter(chave)
+            if texto is None:
+                texto = _gerar_llm(perfil_normalizado, tipo_recomendacao, chave_api, sessao, limitador, timeout, estruturado)
+                origem = "llm"
+                cache.guardar(chave, texto)
+        except Exception as e:
+            contar("fallback", tipo=tipo_recomendacao, motivo=type(e).__name__)
+            erro = f"{type(e).__name__}: {e}"
+            try:
+                if estruturado:
+                    texto = gerar_fallback_estruturado(perfil, tipo_recomendacao)
+                else:
+                    texto = gerar_fallback(perfil, tipo_recomendacao)
+                origem = "fallback"
+            except Exception as erro_fallback:
+                texto = None
+                origem = "erro"
+                erro = f"{erro}; fallback: {type(erro_fallback).__name__}: {erro_fallback}"
+        registro[nome] = orjson.loads(texto) if estruturado and texto is not None else texto
+        registro[f"origem_{nome}"] = origem
+        registro[f"erro_{nome}"] = erro
+        registro[f"latencia_{nome}_s"] = round(time.perf_counter() - inicio, 4)
+    return registro
+
+def gerar_lote(entrada, saida, concorrencia=4, timeout=60, requisicoes_por_minuto=0, tamanho_parte=500, chave_api=None, estruturado=PLANOS_ESTRUTURADOS):
+    escritor = criar_escritor(saida, tamanho_parte, estruturado)
+    concluidos = escritor.concluidos()
+    limitador = None
+    if requisicoes_por_minuto:
+        limitador = LimitadorTaxa(requisicoes_por_minuto, rajada=concorrencia, tamanho_fila=concorrencia)
+    processar = partial(
+        processar_perfil,
+        chave_api=chave_api or openrouter.obter_chave_api(),
+        sessao=openrouter.obter_sessao_http(),
+        cache=obter_cache_recomendacoes(),
+        limitador=limitador,
+        timeout=timeout,
+        estruturado=estruturado,
+    )
+
+    resumo = {"processados": 0, "pulados": 0, "fallbacks": 0, "erros": 0, "cache": 0}
+    latencias = []
+
+    def registrar(futuros):
+        for futuro in futuros:
+            registro = futuro.result()
+            escritor.escrever(registro)
+            resumo["processados"] += 1
+            for nome in TIPOS_RECOMENDACAO:
+                origem = registro[f"origem_{nome}"]
+                if origem == "cache":
+                    resumo["cache"] += 1
+                else:
+                    resumo["fallbacks"] += origem == "fallback"
+                    resumo["erros"] += origem == "erro"
+                    latencias.append(registro[f"latencia_{nome}_s"])
+
+    inicio = time.perf_counter()
+    pendentes = set()
+    try:
+        with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="lote") as executor:
+            for perfil in ler_perfis(entrada):
+                if perfil["id"] in concluidos:
+                    resumo["pulados"] += 1
+                    continue
+                # Mantém poucos perfis em memória: só submete mais quando algum termina
+                if len(pendentes) >= concorrencia * 2:
+                    prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                    registrar(prontos)
+                pendentes.add(executor.submit(processar, perfil))
+            prontos, _ = wait(pendentes)
+            registrar(prontos)
+    finally:
+        escritor.fechar()
+
+    duracao = time.perf_counter() - inicio
+    resumo["duracao_s"] = round(duracao, 2)
+    resumo["perfis_por_minuto"] = round(resumo["processados"] / duracao * 60, 1) if duracao else 0.0
+    resumo["latencia_p50_s"] = round(percentil(latencias, 50), 3) if latencias else 0.0
+    resumo["latencia_p95_s"] = round(percentil(latencias, 95), 3) if latencias else 0.0
+    return resumo
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera planos de dieta e treino para uma lista de perfis")
+    parser.add_argument("entrada", help="arquivo .jsonl ou .csv com os perfis")
+    parser.add_argument("saida", help="arquivo .jsonl ou diretório .parquet (retoma de onde parou)")
+    parser.add_argument("--concorrencia", type=int, default=4, help="requisições simultâneas ao LLM")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout de leitura por requisição, em segundos")
+    parser.add_argument("--rpm", type=float, default=0, help="limite de requisições por minuto (0 = sem limite)")
+    parser.add_argument("--tamanho-parte", type=int, default=500, help="perfis por arquivo na saída Parquet")
+    parser.add_argument("--url", help="endpoint de chat completions (ex.: servidor de teste local)")
+    parser.add_argument("--chave-api")
+    parser.add_argument("--estruturado", action="store_true", default=PLANOS_ESTRUTURADOS, help="planos em JSON validado em vez de markdown")
+    args = parser.parse_args()
+
+    if args.url:
+        openrouter.OPENROUTER_URL = args.url
+    resumo = gerar_lote(
+        args.entrada,
+        args.saida,
+        concorrencia=args.concorrencia,
+        timeout=args.timeout,
+        requisicoes_por_minuto=args.rpm,
+        tamanho_parte=args.tamanho_parte,
+        chave_api=args.chave_api,
+        estruturado=args.estruturado,
+    )
+    print(
+        f"{resumo['processados']} perfis em {resumo['duracao_s']} s ({resumo['perfis_por_minuto']} perfis/min); "
+        f"latência p50 {resumo['latencia_p50_s']} s, p95 {resumo['latencia_p95_s']} s; "
+        f"{resumo['fallbacks']} fallbacks, {resumo['erros']} planos com erro, {resumo['cache']} do cache, {resumo['pulados']} já concluídos"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import hashlib
+import hmac
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    event,
+    insert,
+    select,
+    update,
+)
+
+from instrumentacao import cronometrado
+
+# Histórico persistente de perfis, medidas e planos (SQLite por padrão; qualquer URL do SQLAlchemy)
+HISTORICO_URL = os.environ.get("HISTORICO_URL", "sqlite:///musclegainer.db")
+# Senhas erradas seguidas que bloqueiam o identificador, e por quantos segundos
+HISTORICO_MAX_FALHAS = int(os.environ.get("HISTORICO_MAX_FALHAS", "5"))
+HISTORICO_BLOQUEIO = float(os.environ.get("HISTORICO_BLOQUEIO", "900"))
+
+# Chave do dict de medições da página -> coluna da tabela de medidas
+COLUNAS_MEDIDAS = {
+    "Braços": "bracos",
+    "Peito": "peito",
+    "Cintura": "cintura",
+    "Quadril": "quadril",
+    "Coxas": "coxas",
+    "Glúteos": "gluteos",
+}
+
+METADADOS = MetaData()
+
+# Último perfil informado por usuário
+PERFIS = Table(
+    "perfis",
+    METADADOS,
+    Column("usuario", String(120), primary_key=True),
+    Column("dados", Text, nullable=False),
+    Column("atualizado_em", DateTime, nullable=False),
+)
+
+# Uma linha por envio do formulário, com uma coluna por medida (lida em bloco na tela de progresso)
+MEDICOES = Table(
+    "medicoes",
+    METADADOS,
+    Column("id", Integer, primary_key=True),
+    Column("usuario", String(120), nullable=False),
+    Column("data", DateTime, nullable=False),
+    Column("peso", Float),
+    *(Column(coluna, Float) for coluna in COLUNAS_MEDIDAS.values()),
+    Index("ix_medicoes_usuario_data", "usuario", "data"),
+)
+
+# Planos em markdown ou, no modo estruturado, o JSON validado (consultável campo a campo com json_extract)
+PLANOS = Table(
+    "planos",
+    METADADOS,
+    Column("id", Integer, primary_key=True),
+    Column("usuario", String(120), nullable=False),
+    Column("data", DateTime, nullable=False),
+    Column("tipo", String(40), nullable=False),
+    Column("texto", Text, nullable=False),
+    Index("ix_planos_usuario_data", "usuario", "data"),
+)
+
+# Senha de cada identificador (e-mail ou apelido), definida no primeiro uso: sem ela o histórico
+# não é gravado nem exibido. Só o hash scrypt com sal fica no banco
+CREDENCIAIS = Table(
+    "credenciais",
+    METADADOS,
+    Column("usuario", String(120), primary_key=True),
+    Column("sal", LargeBinary(16), nullable=False),
+    Column("hash_senha", LargeBinary(32), nullable=False),
+    Column("criado_em", DateTime, nullable=False),
+    Column("falhas", Integer, nullable=False),
+    Column("bloqueado_ate", DateTime),
+)
+
+COLUNAS_HISTORICO = ["data", "peso", *COLUNAS_MEDIDAS.values()]
+
+class AcessoNegado(Exception):
+    pass
+
+def _hash_senha(senha, sal):
+    return hashlib.scrypt(senha.encode("utf-8"), salt=sal, n=2 ** 14, r=8, p=1, dklen=32)
+
+# WAL deixa as leituras da tela de progresso correrem junto com as gravações de outras sessões
+def _configurar_sqlite(conexao, _registro):
+    cursor = conexao.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def registro_medicao(usuario, dados_usuario, data=None):
+    return {
+        "usuario": usuario,
+        "data": data or datetime.now(),
+        "peso": dados_usuario["peso"],
+        **{coluna: dados_usuario["medidas"].get(parte) for parte, coluna in COLUNAS_MEDIDAS.items()},
+    }
+
+class Historico:
+    def __init__(self, url=HISTORICO_URL):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", _configurar_sqlite)
+        METADADOS.create_all(self.engine)
+
+    # Confere a senha do identificador, registrando-a no primeiro uso, e devolve o instante do registro.
+    # Senha errada (ou identificador bloqueado depois de HISTORICO_MAX_FALHAS erros) levanta AcessoNegado
+    @cronometrado("historico_autenticacao")
+    def autenticar(self, usuario, senha, agora=None):
+        agora = agora or datetime.now()
+        with self.engine.begin() as conexao:
+            credencial = conexao.execute(select(CREDENCIAIS).where(CREDENCIAIS.c.usuario == usuario)).first()
+            if credencial is None:
+                sal = os.urandom(16)
+                conexao.execute(insert(CREDENCIAIS).values(
+                    usuario=usuario, sal=sal, hash_senha=_hash_senha(senha, sal), criado_em=agora, falhas=0,
+                ))
+                return agora
+            if credencial.bloqueado_ate is not None and credencial.bloqueado_ate > agora:
+                raise AcessoNegado("Muitas tentativas com a senha errada. Tente de novo mais tarde.")
+            if hmac.compare_digest(_hash_senha(senha, credencial.sal), credencial.hash_senha):
+                if credencial.falhas:
+                    conexao.execute(
+                        update(CREDENCIAIS).where(CREDENCIAIS.c.usuario == usuario).values(falhas=0, bloqueado_ate=None)
+                    )
+                return credencial.criado_em
+            # A contagem de falhas precisa ser gravada antes do erro (que desfaria a transação)
+            falhas = credencial.falhas + 1
+            bloqueado_ate = agora + timedelta(seconds=HISTORICO_BLOQUEIO) if falhas >= HISTORICO_MAX_FALHAS else None
+            conexao.execute(
+                update(CREDENCIAIS)
+                .where(CREDENCIAIS.c.usuario == usuario)
+                .values(falhas=0 if bloqueado_ate else falhas, bloqueado_ate=bloqueado_ate)
+            )
+        raise AcessoNegado("Senha errada para este e-mail ou apelido.")
+
+    # Guarda o perfil atual e uma nova linha de medidas na mesma transação
+    @cronometrado("historico_gravacao")
+    def salvar_perfil(self, usuario, dados_usuario, data=None):
+        data = data or datetime.now()
+        dados = json.dumps(dados_usuario, ensure_ascii=False)
+        with self.engine.begin() as conexao:
+            atualizados = conexao.execute(
+                update(PERFIS).where(PERFIS.c.usuario == usuario).values(dados=dados, atualizado_em=data)
+            ).rowcount
+            if not atualizados:
+                conexao.execute(insert(PERFIS).values(usuario=usuario, dados=dados, atualizado_em=data))
+            conexao.execute(insert(MEDICOES), [registro_medicao(usuario, dados_usuario, data)])
+
+    def salvar_planos(self, usuario, planos, data=None):
+        data = data or datetime.now()
+        with self.engine.begin() as conexao:
+            conexao.execute(
+                insert(PLANOS),
+                [{"usuario": usuario, "data": data, "tipo": tipo, "texto": texto} for tipo, texto in planos.items()],
+            )
+
+    # Inserção em lote (importações e benchmark); `registros` no formato de registro_medicao
+    def inserir_medicoes(self, registros):
+        with self.engine.begin() as conexao:
+            conexao.execute(insert(MEDICOES), registros)
+
+    # Histórico de medidas em uma única consulta por faixa no índice (usuario, data),
+    # montado coluna a coluna em um DataFrame indexado pela data
+    @cronometrado("historico_consulta")
+    def carregar_medicoes(self, usuario, inicio=None, fim=None):
+        consulta = select(*(MEDICOES.c[coluna] for coluna in COLUNAS_HISTORICO)).where(MEDICOES.c.usuario == usuario)
+        if inicio is not None:
+            consulta = consulta.where(MEDICOES.c.data >= inicio)
+        if fim is not None:
+            consulta = consulta.where(MEDICOES.c.data < fim)
+        with self.engine.connect() as conexao:
+            linhas = conexao.execute(consulta.order_by(MEDICOES.c.data)).all()
+        colunas = list(zip(*linhas)) or [()] * len(COLUNAS_HISTORICO)
+        return pd.DataFrame(
+            {coluna: np.asarray(valores, dtype=float) for coluna, valores in zip(COLUNAS_HISTORICO[1:], colunas[1:])},
+            index=pd.DatetimeIndex(colunas[0], name="data"),
+        )
+
+# Instância única compartilhada por todas as sessões do servidor
+@st.cache_resource
+def obter_historico():
+    return Historico()
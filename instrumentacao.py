@@ -0,0 +1,237 @@
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Configuração da instrumentação (desligada, as funções abaixo retornam sem fazer nada)
+INSTRUMENTACAO_ATIVA = os.environ.get("INSTRUMENTACAO_ATIVA", "1") == "1"
+INSTRUMENTACAO_PORTA = int(os.environ.get("INSTRUMENTACAO_PORTA", "0"))
+INSTRUMENTACAO_ARQUIVO = os.environ.get("INSTRUMENTACAO_ARQUIVO", "")
+INSTRUMENTACAO_INTERVALO = float(os.environ.get("INSTRUMENTACAO_INTERVALO", "15"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+PREFIXO = "massa_muscular"
+# Limites (em segundos) dos buckets do histograma exportado
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Amostras recentes guardadas por etapa para os percentis do painel
+AMOSTRAS_POR_ETAPA = 2048
+
+# Percentil pelo posto mais próximo, o mesmo no painel, no roteador, no lote e nos benchmarks
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+class _Histograma:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self.amostras = deque(maxlen=AMOSTRAS_POR_ETAPA)
+
+    def observar(self, segundos):
+        self.buckets[bisect.bisect_left(BUCKETS, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+        self.amostras.append(segundos)
+
+class Metricas:
+    def __init__(self):
+        self._histogramas = {}
+        self._contadores = Counter()
+        self._coletores = {}
+        self._lock = threading.Lock()
+
+    def registrar_duracao(self, etapa, segundos):
+        with self._lock:
+            histograma = self._histogramas.get(etapa)
+            if histograma is None:
+                histograma = self._histogramas[etapa] = _Histograma()
+            histograma.observar(segundos)
+
+    def contar(self, evento, quantidade=1, **rotulos):
+        with self._lock:
+            self._contadores[(evento, tuple(sorted(rotulos.items())))] += quantidade
+
+    # Função que devolve um dict de números (ex.: estatísticas do cache), exportado como gauges
+    def registrar_coletor(self, nome, funcao):
+        with self._lock:
+            self._coletores[nome] = funcao
+
+    def percentis(self):
+        with self._lock:
+            amostras = {etapa: list(h.amostras) for etapa, h in self._histogramas.items()}
+            totais = {etapa: h.total for etapa, h in self._histogramas.items()}
+        resultado = []
+        for etapa, valores in sorted(amostras.items()):
+            linha = {"etapa": etapa, "total": totais[etapa]}
+            for p in (50, 95, 99):
+                linha[f"p{p}_ms"] = round(percentil(valores, p) * 1000, 1)
+            resultado.append(linha)
+        return resultado
+
+    def amostras(self, etapa):
+        with self._lock:
+            histograma = self._histogramas.get(etapa)
+            return list(histograma.amostras) if histograma else []
+
+    def distribuicao(self, etapa):
+        with self._lock:
+            histograma = self._histogramas.get(etapa)
+            buckets = list(histograma.buckets) if histograma else [0] * (len(BUCKETS) + 1)
+        rotulos = [f"≤{limite}s" for limite in BUCKETS] + [f">{BUCKETS[-1]}s"]
+        return dict(zip(rotulos, buckets))
+
+    def contadores(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    def exportar_prometheus(self):
+        with self._lock:
+            histogramas = {etapa: (list(h.buckets), h.soma, h.total) for etapa, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+            coletores = dict(self._coletores)
+
+        linhas = []
+        if histogramas:
+            nome = f"{PREFIXO}_etapa_segundos"
+            linhas.append(f"# TYPE {nome} histogram")
+            for etapa, (buckets, soma, total) in sorted(histogramas.items()):
+                acumulado = 0
+                for limite, quantidade in zip(BUCKETS, buckets):
+                    acumulado += quantidade
+                    linhas.append(f'{nome}_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+                linhas.append(f'{nome}_bucket{{etapa="{etapa}",le="+Inf"}} {total}')
+                linhas.append(f'{nome}_sum{{etapa="{etapa}"}} {soma}')
+                linhas.append(f'{nome}_count{{etapa="{etapa}"}} {total}')
+
+        tipos_declarados = set()
+        for (evento, rotulos), quantidade in sorted(contadores.items()):
+            nome = f"{PREFIXO}_{evento}_total"
+            if nome not in tipos_declarados:
+                linhas.append(f"# TYPE {nome} counter")
+                tipos_declarados.add(nome)
+            texto_rotulos = ",".join(f'{chave}="{valor}"' for chave, valor in rotulos)
+            linhas.append(f"{nome}{{{texto_rotulos}}} {quantidade}" if texto_rotulos else f"{nome} {quantidade}")
+
+        for coletor, funcao in sorted(coletores.items()):
+            for chave, valor in sorted(funcao().items()):
+                nome = f"{PREFIXO}_{coletor}_{chave}"
+                linhas.append(f"# TYPE {nome} gauge")
+                linhas.append(f"{nome} {valor}")
+        return "\n".join(linhas) + "\n"
+
+METRICAS = Metricas()
+
+# Contexto reutilizado quando a instrumentação está desligada (nenhuma alocação por chamada)
+_SEM_MEDICAO = contextlib.nullcontext()
+
+@contextlib.contextmanager
+def _medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICAS.registrar_duracao(etapa, time.perf_counter() - inicio)
+
+def medir(etapa):
+    if not INSTRUMENTACAO_ATIVA:
+        return _SEM_MEDICAO
+    return _medir(etapa)
+
+def cronometrado(etapa):
+    def decorador(funcao):
+        if not INSTRUMENTACAO_ATIVA:
+            return funcao
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with _medir(etapa):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+def registrar_duracao(etapa, segundos):
+    if INSTRUMENTACAO_ATIVA:
+        METRICAS.registrar_duracao(etapa, segundos)
+
+def contar(evento, quantidade=1, **rotulos):
+    if INSTRUMENTACAO_ATIVA:
+        METRICAS.contar(evento, quantidade, **rotulos)
+
+def registrar_coletor(nome, funcao):
+    if INSTRUMENTACAO_ATIVA:
+        METRICAS.registrar_coletor(nome, funcao)
+
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        conteudo = METRICAS.exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+def _gravar_periodicamente(caminho, intervalo):
+    while True:
+        time.sleep(intervalo)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(METRICAS.exportar_prometheus())
+        os.replace(temporario, caminho)
+
+# Sobe o endpoint /metrics e/ou a gravação periódica em arquivo, uma única vez por processo.
+# Com a porta ocupada (outro processo do Streamlit, por exemplo) o app segue sem o endpoint: o erro
+# não pode escapar, porque o cache_resource não guarda exceções e ele se repetiria a cada execução
+@st.cache_resource
+def iniciar_exportacao():
+    if not INSTRUMENTACAO_ATIVA:
+        return None
+    if INSTRUMENTACAO_PORTA:
+        try:
+            servidor = ThreadingHTTPServer(("127.0.0.1", INSTRUMENTACAO_PORTA), _ManipuladorMetricas)
+        except OSError as e:
+            logger.warning("Endpoint de métricas desativado: porta %s indisponível (%s)", INSTRUMENTACAO_PORTA, e)
+        else:
+            threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas-http").start()
+    if INSTRUMENTACAO_ARQUIVO:
+        threading.Thread(
+            target=_gravar_periodicamente,
+            args=(INSTRUMENTACAO_ARQUIVO, INSTRUMENTACAO_INTERVALO),
+            daemon=True,
+            name="metricas-arquivo",
+        ).start()
+    return METRICAS
+
+# Painel escondido: só aparece com ?admin=<ADMIN_TOKEN> na URL
+def exibir_painel_admin():
+    if not INSTRUMENTACAO_ATIVA or not ADMIN_TOKEN or st.query_params.get("admin") != ADMIN_TOKEN:
+        return
+    with st.sidebar:
+        st.header("Painel de desempenho")
+        percentis = METRICAS.percentis()
+        if percentis:
+            st.dataframe(percentis, hide_index=True)
+            etapa = st.selectbox("Distribuição da etapa:", [linha["etapa"] for linha in percentis])
+            st.bar_chart(METRICAS.distribuicao(etapa))
+        st.subheader("Contadores")
+        st.json({
+            f"{evento} {dict(rotulos)}" if rotulos else evento: quantidade
+            for (evento, rotulos), quantidade in sorted(METRICAS.contadores().items())
+        })
+        st.subheader("Prometheus")
+        st.code(METRICAS.exportar_prometheus(), language="text")
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+
+import streamlit as st
+
+from instrumentacao import registrar_coletor, registrar_duracao
+
+# Limites do modelo gratuito (podem ser sobrescritos por variáveis de ambiente)
+LIMITE_REQUISICOES_POR_MINUTO = float(os.environ.get("LIMITE_REQUISICOES_POR_MINUTO", "20"))
+LIMITE_RAJADA = float(os.environ.get("LIMITE_RAJADA", "5"))
+LIMITE_TAMANHO_FILA = int(os.environ.get("LIMITE_TAMANHO_FILA", "50"))
+
+class FilaCheia(Exception):
+    pass
+
+# Lugar de uma geração na fila de admissão. Cada requisição ao upstream gasta uma ficha: a primeira
+# usa o lugar tirado na entrada e as seguintes (retentativas, failover) voltam para o fim da fila.
+# A geração pode ser admitida antes de ter uma thread do executor; enquanto a thread dela não
+# estiver esperando em aguardar, o lugar conta para a posição, mas não segura fichas
+class Senha:
+    def __init__(self, limitador):
+        self._limitador = limitador
+        self.na_fila = True
+        self.esperando = False
+
+    def posicao(self):
+        return self._limitador.posicao(self)
+
+    def espera_estimada(self):
+        return self._limitador.espera_estimada(self)
+
+    def aguardar(self):
+        self._limitador.aguardar(self)
+
+    # Ficha para uma requisição opcional (hedge): só se houver uma livre agora, sem entrar na fila
+    def tentar(self):
+        return self._limitador.tentar(self)
+
+    # A geração terminou sem gastar o lugar (ex.: falhou antes da primeira requisição)
+    def sair(self):
+        self._limitador.sair(self)
+
+# Token bucket compartilhado com uma fila FIFO limitada na frente
+class LimitadorTaxa:
+    def __init__(self, requisicoes_por_minuto=LIMITE_REQUISICOES_POR_MINUTO, rajada=LIMITE_RAJADA, tamanho_fila=LIMITE_TAMANHO_FILA):
+        self.taxa = requisicoes_por_minuto / 60
+        self.rajada = rajada
+        self.tamanho_fila = tamanho_fila
+        self.contadores = Counter()
+        self._fichas = rajada
+        self._ultima_recarga = time.monotonic()
+        self._fila = deque()
+        self._condicao = threading.Condition()
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        self._fichas = min(self.rajada, self._fichas + (agora - self._ultima_recarga) * self.taxa)
+        self._ultima_recarga = agora
+
+    # Chamada com o lock
+    def _enfileirar(self, senha):
+        if len(self._fila) >= self.tamanho_fila:
+            self.contadores["recusadas"] += 1
+            raise FilaCheia(f"Fila de geração cheia ({self.tamanho_fila} pedidos aguardando)")
+        self._fila.append(senha)
+        senha.na_fila = True
+
+    # Chamada com o lock: a primeira senha da fila cuja thread está esperando uma ficha
+    def _proxima(self):
+        return next((senha for senha in self._fila if senha.esperando), None)
+
+    def entrar(self):
+        with self._condicao:
+            senha = Senha(self)
+            self._enfileirar(senha)
+            self.contadores["admitidas"] += 1
+            return senha
+
+    # Posição na fila a partir de 1; 0 quando a senha já foi liberada
+    def posicao(self, senha):
+        with self._condicao:
+            try:
+                return self._fila.index(senha) + 1
+            except ValueError:
+                return 0
+
+    def espera_estimada(self, senha):
+        with self._condicao:
+            self._recarregar()
+            try:
+                necessarias = self._fila.index(senha) + 1
+            except ValueError:
+                return 0.0
+            return max(0.0, (necessarias - self._fichas) / self.taxa)
+
+    def aguardar(self, senha):
+        inicio = time.monotonic()
+        with self._condicao:
+            if not senha.na_fila:
+                # Ficha já gasta numa requisição anterior da mesma geração
+                self._enfileirar(senha)
+                self.contadores["reentradas"] += 1
+            senha.esperando = True
+            while True:
+                self._recarregar()
+                # Senhas à frente cujas gerações ainda não têm thread não seguram a ficha: se a vez
+                # fosse delas, os trabalhadores ocupados esperariam quem só roda quando um deles terminar
+                proxima = self._proxima()
+                if proxima is senha and self._fichas >= 1:
+                    self._fichas -= 1
+                    self._fila.remove(senha)
+                    senha.na_fila = senha.esperando = False
+                    self.contadores["espera_total_s"] += time.monotonic() - inicio
+                    registrar_duracao("espera_fila", time.monotonic() - inicio)
+                    self._condicao.notify_all()
+                    return
+                # Só a próxima da vez sabe quando a ficha chega; as demais esperam a vez dela
+                espera = (1 - self._fichas) / self.taxa if proxima is senha else None
+                self._condicao.wait(espera)
+
+    # Não passa na frente de quem está na fila: com alguém esperando, a ficha é dele
+    def tentar(self, senha):
+        with self._condicao:
+            self._recarregar()
+            if senha.na_fila or self._proxima() is not None or self._fichas < 1:
+                self.contadores["extras_negadas"] += 1
+                return False
+            self._fichas -= 1
+            self.contadores["extras"] += 1
+            return True
+
+    def sair(self, senha):
+        with self._condicao:
+            if senha.na_fila:
+                self._fila.remove(senha)
+                senha.na_fila = senha.esperando = False
+                self._condicao.notify_all()
+
+    def estatisticas(self):
+        with self._condicao:
+            self._recarregar()
+            return {**self.contadores, "na_fila": len(self._fila), "fichas": round(self._fichas, 2)}
+
+# Limitador único do processo, compartilhado por todas as sessões
+@st.cache_resource
+def obter_limitador():
+    limitador = LimitadorTaxa()
+    registrar_coletor("limitador", limitador.estatisticas)
+    return limitador
@@ -1,7 +1,27 @@
 import streamlit as st
-import json
-import requests
-from datetime import datetime
+import importlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+
+import conteudo_estatico
+from cache_recomendacoes import chave_cache, normalizar_perfil, obter_cache_recomendacoes
+from exportacao_pdf import PDF_INTERVALO_CONSULTA, obter_exportador_pdf
+from instrumentacao import contar, cronometrado, exibir_painel_admin, iniciar_exportacao, medir, registrar_duracao
+from limitador import FilaCheia, obter_limitador
+from recomendacoes import PLANOS_ESTRUTURADOS, gerar_fallback, montar_payload_llm
+from tarefas import TAREFAS_INTERVALO_CONSULTA, obter_tabela_tarefas
+
+# Módulos com dependências pesadas (numpy/pandas, requests/tenacity, reportlab e SQLAlchemy), importados no
+# primeiro uso para não atrasar a primeira renderização; depois dela são carregados em segundo plano
+MODULOS_ADIADOS = ("metricas_corporais", "openrouter", "roteador", "reportlab.platypus", "historico", "planos")
+AQUECER_IMPORTACOES = os.environ.get("AQUECER_IMPORTACOES", "1") == "1"
+
+# Início da execução do script (medido a cada rerun)
+inicio_execucao = time.perf_counter()
 
 # Configuração da página
 st.set_page_config(
@@ -10,258 +30,409 @@ st.set_page_config(
     layout="wide"
 )
 
-# Estilo CSS personalizado
-st.markdown("""
-<style>
-    .main {
-        padding: 2rem;
-    }
-    .title {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #3366cc;
-        margin-bottom: 2rem;
-        text-align: center;
-    }
-    .subtitle {
-        font-size: 1.5rem;
-        color: #555;
-        margin-bottom: 1rem;
-    }
-    .info-box {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-    }
-    .result-section {
-        background-color: #e6f3ff;
-        padding: 1.5rem;
-        border-radius: 10px;
-        margin-top: 2rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Estilo CSS personalizado, título e subtítulo
+st.markdown(conteudo_estatico.CABECALHO, unsafe_allow_html=True)
 
-# Função para gerar recomendações usando LLM
-def gerar_recomendacao_llm(dados_usuario, tipo_recomendacao):
-    try:
-        prompt = f"""
-        Com base nos seguintes dados do usuário:
-        - Sexo: {dados_usuario['sexo']}
-        - Idade: {dados_usuario['idade']} anos
-        - Peso: {dados_usuario['peso']} kg
-        - Altura: {dados_usuario['altura']} cm
-        - Medidas dos membros: {dados_usuario['medidas']}
-        - Áreas de foco: {', '.join(dados_usuario['membros_foco'])}
-        - Preferência de treino: {dados_usuario['tipo_treino']}
-        
-        Por favor, gere uma {tipo_recomendacao} detalhada e personalizada para ganho de massa muscular.
-        """
-        
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": "Bearer " + st.secrets["qwen_key"],
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://musclegainer.com",
-                "X-Title": "MuscleGainer",
-            },
-            data=json.dumps({
-                "model": "qwen/qwen2.5-vl-72b-instruct:free",
-                "messages": [
-                    {"role": "system", "content": "Você é um especialista em nutrição esportiva e treinamento para hipertrofia. Forneça recomendações detalhadas, específicas e personalizadas."},
-                    {"role": "user", "content": prompt},
-                ],
-            })
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-    except Exception as e:
-        st.error(f"Erro ao gerar recomendação: {str(e)}")
-        # Fallback para recomendações básicas em caso de erro na API
-        if tipo_recomendacao == "dieta":
-            return gerar_dieta_fallback(dados_usuario)
-        else:
-            return gerar_treino_fallback(dados_usuario)
+# Identificador da sessão na tabela de tarefas
+def obter_id_sessao():
+    if 'id_sessao' not in st.session_state:
+        st.session_state['id_sessao'] = uuid.uuid4().hex
+    return st.session_state['id_sessao']
 
-# Funções de fallback para quando a API falhar
-def gerar_dieta_fallback(dados_usuario):
-    sexo = dados_usuario['sexo']
-    peso = dados_usuario['peso']
-    
-    calorias = int(peso * (37 if sexo == "Masculino" else 35))
-    proteina = int(peso * 2)
-    carbs = int(peso * 4)
-    gordura = int(peso * 1)
-    
-    return f"""
-    ## Recomendação Básica de Dieta para Ganho de Massa
-    
-    ### Calorias diárias: {calorias} kcal
-    - Proteínas: {proteina}g ({proteina * 4} kcal)
-    - Carboidratos: {carbs}g ({carbs * 4} kcal)
-    - Gorduras: {gordura}g ({gordura * 9} kcal)
-    
-    ### Distribuição das refeições:
-    1. **Café da manhã**: Rica em proteínas e carboidratos
-    2. **Lanche da manhã**: Proteína e gorduras boas
-    3. **Almoço**: Proteína, carboidratos complexos e vegetais
-    4. **Lanche da tarde**: Proteína e carboidratos
-    5. **Pré-treino**: Carboidratos rápidos e proteína
-    6. **Pós-treino**: Proteína e carboidratos rápidos
-    7. **Jantar**: Proteína e vegetais
-    
-    ### Alimentos recomendados:
-    - **Proteínas**: frango, peixe, carne vermelha magra, ovos, whey protein
-    - **Carboidratos**: arroz, batata doce, aveia, quinoa, frutas
-    - **Gorduras**: azeite, abacate, castanhas, sementes
-    
-    Hidrate-se bem! Beba pelo menos 35ml de água por kg de peso corporal.
-    """
+# Exibe o erro e devolve a recomendação básica correspondente
+def tratar_erro_llm(erro, dados_usuario, tipo_recomendacao):
+    contar("fallback", tipo=tipo_recomendacao, motivo=type(erro).__name__)
+    if isinstance(erro, FilaCheia):
+        st.warning("Muitos pedidos no momento. Exibindo uma recomendação básica; tente gerar novamente em alguns minutos.")
+    else:
+        st.error(f"Erro ao gerar recomendação: {str(erro)}")
+    # Fallback para recomendações básicas depois de esgotadas as retentativas
+    if PLANOS_ESTRUTURADOS:
+        from planos import gerar_fallback_estruturado
+        return gerar_fallback_estruturado(dados_usuario, tipo_recomendacao)
+    return gerar_fallback(dados_usuario, tipo_recomendacao)
 
-def gerar_treino_fallback(dados_usuario):
-    tipo_treino = dados_usuario['tipo_treino']
-    membros_foco = dados_usuario['membros_foco']
+# Busca a recomendação no cache ou associa à sessão a tarefa de geração do perfil, que é única entre as sessões
+def obter_ou_iniciar_geracao(dados_usuario, tipo_recomendacao, chave_estado):
+    from openrouter import gerar_em_segundo_plano, obter_chave_api, obter_sessao_http
+    from roteador import obter_roteador
     
-    treino = "## Programa de Treino Básico para Hipertrofia\n\n"
+    cache = obter_cache_recomendacoes()
+    perfil = normalizar_perfil(dados_usuario)
+    chave = chave_cache(perfil, tipo_recomendacao, "json" if PLANOS_ESTRUTURADOS else None)
+    texto = cache.obter(chave)
+    if texto is not None:
+        return texto, None
     
-    if tipo_treino == "Com aparelhos":
-        treino += """
-        ### Divisão de treino recomendada:
-        - **Segunda**: Peito e Tríceps
-        - **Terça**: Costas e Bíceps
-        - **Quarta**: Descanso ou Cardio leve
-        - **Quinta**: Pernas, Glúteos e Ombros
-        - **Sexta**: Treino dos grupos que deseja focar mais
-        - **Sábado/Domingo**: Descanso
-        
-        ### Princípios gerais:
-        - 3-4 exercícios por grupo muscular
-        - 3-4 séries por exercício
-        - 8-12 repetições (foco em hipertrofia)
-        - Descanso de 60-90 segundos entre séries
-        - Treino com intensidade entre 70-85% de 1RM
-        """
+    if PLANOS_ESTRUTURADOS:
+        # Só o plano validado vai para o cache, já em bytes
+        from planos import guardar_plano
+        ao_concluir = partial(guardar_plano, cache, chave, tipo_recomendacao)
     else:
-        treino += """
-        ### Divisão de treino recomendada:
-        - **Segunda**: Empurrar (peito, ombros, tríceps)
-        - **Terça**: Puxar (costas, bíceps)
-        - **Quarta**: Descanso ou Cardio leve
-        - **Quinta**: Pernas, Glúteos e Core
-        - **Sexta**: Circuito full body com foco nos grupos prioritários
-        - **Sábado/Domingo**: Descanso
-        
-        ### Princípios gerais:
-        - Utilizar o peso corporal e resistência progressiva
-        - Variar o tempo sob tensão e ângulos de execução
-        - 3-4 séries por exercício
-        - 8-15 repetições (foco em hipertrofia)
-        - Descanso de 60-90 segundos entre séries
-        """
-    
-    for membro in membros_foco:
-        treino += f"\n### Exercícios específicos para {membro}:\n"
-        if membro == "Peito":
-            if tipo_treino == "Com aparelhos":
-                treino += "- Supino reto com barra\n- Crucifixo com halteres\n- Supino inclinado na máquina\n- Crossover no cabo"
-            else:
-                treino += "- Flexões com variações\n- Flexões declinadas\n- Flexões diamante\n- Dips entre cadeiras"
-        elif membro == "Costas":
-            if tipo_treino == "Com aparelhos":
-                treino += "- Puxada na frente\n- Remada curvada\n- Pulldown\n- Remada unilateral com halter"
-            else:
-                treino += "- Barras\n- Remadas invertidas\n- Superman\n- Remada com elástico"
-        elif membro == "Pernas":
-            if tipo_treino == "Com aparelhos":
-                treino += "- Agachamento com barra\n- Leg press\n- Cadeira extensora\n- Mesa flexora"
-            else:
-                treino += "- Agachamentos\n- Afundos\n- Stiff com peso corporal\n- Bulgarian split squat"
-        elif membro == "Braços":
-            if tipo_treino == "Com aparelhos":
-                treino += "- Rosca direta\n- Rosca scott\n- Tríceps corda\n- Tríceps francês"
-            else:
-                treino += "- Rosca com elástico\n- Dips para tríceps\n- Flexões diamante\n- Rosca martelo com garrafa pet"
-        elif membro == "Ombros":
-            if tipo_treino == "Com aparelhos":
-                treino += "- Desenvolvimento com halteres\n- Elevação lateral\n- Face pull\n- Desenvolvimento arnold"
-            else:
-                treino += "- Pike push-ups\n- Elevação lateral com garrafas\n- Elevação frontal com objetos\n- Flexões em Y"
-        elif membro == "Glúteos":
-            if tipo_treino == "Com aparelhos":
-                treino += "- Hip thrust com barra\n- Abdução de quadril na máquina\n- Elevação pélvica\n- Coice na polia"
+        ao_concluir = partial(cache.guardar, chave)
+    tarefas = obter_tabela_tarefas()
+    iniciar = partial(
+        gerar_em_segundo_plano,
+        tarefas.executor,
+        montar_payload_llm(perfil, tipo_recomendacao),
+        obter_chave_api(),
+        obter_sessao_http(),
+        ao_concluir=ao_concluir,
+        limitador=obter_limitador(),
+        roteador=obter_roteador(),
+    )
+    return None, tarefas.obter_ou_iniciar(obter_id_sessao(), chave_estado, chave, iniciar)
+
+# Dispara a dieta e o treino ao mesmo tempo no pool de tarefas (o que já estiver no cache vai direto para a session state)
+def iniciar_recomendacoes_concorrentes(dados_usuario):
+    for chave_estado, tipo_recomendacao in (('dieta_recomendacao', "dieta"), ('treino_recomendacao', "programa de treino")):
+        texto, _ = obter_ou_iniciar_geracao(dados_usuario, tipo_recomendacao, chave_estado)
+        if texto is not None:
+            st.session_state[chave_estado] = texto
+            # Uma tarefa de um envio anterior não é mais acompanhada por esta aba
+            obter_tabela_tarefas().liberar(obter_id_sessao(), chave_estado)
+
+# Consulta a tarefa da sessão até ela terminar, mostrando a posição na fila do limitador ou o texto
+# parcial; um rerun no meio interrompe só a consulta, e a execução seguinte retoma a mesma tarefa
+def acompanhar_tarefa(geracao, area):
+    lidos = -1
+    while not geracao.concluida:
+        posicao = geracao.senha.posicao() if geracao.senha is not None else 0
+        if posicao:
+            area.info(f"Você está na posição {posicao} da fila. Espera estimada: {geracao.senha.espera_estimada():.0f} s")
+            time.sleep(0.5)
+            continue
+        if len(geracao.trechos) != lidos:
+            lidos = len(geracao.trechos)
+            if PLANOS_ESTRUTURADOS:
+                # JSON incompleto não é exibido; só o andamento
+                area.info(f"Montando o plano... {len(geracao.texto)} caracteres recebidos")
             else:
-                treino += "- Hip thrust com peso corporal\n- Ponte de glúteos\n- Elevação de quadril unilateral\n- Fire hydrant (hidrante)"
-    
-    return treino
+                area.markdown(geracao.texto + " ▌")
+        geracao.aguardar(lidos, TAREFAS_INTERVALO_CONSULTA)
+    if geracao.erro is not None:
+        raise geracao.erro
+    return geracao.texto
 
-# Inicialização de variáveis de estado
-if 'generate_results' not in st.session_state:
-    st.session_state['generate_results'] = False
+# Texto em markdown ou plano estruturado (bytes), exibido em tabelas
+def exibir_plano_ou_texto(tipo_recomendacao, valor):
+    with medir("renderizacao_recomendacao"):
+        if isinstance(valor, bytes):
+            from planos import exibir_plano
+            exibir_plano(tipo_recomendacao, valor)
+        else:
+            st.markdown(valor)
 
-# Título principal
-st.markdown('<div class="title">MuscleGainer App</div>', unsafe_allow_html=True)
-st.markdown('<div class="subtitle">Seu assistente pessoal para ganho de massa muscular</div>', unsafe_allow_html=True)
+# Markdown do plano (download em texto e PDF)
+def em_markdown(tipo_recomendacao, valor):
+    if isinstance(valor, bytes):
+        from planos import plano_para_markdown
+        return plano_para_markdown(tipo_recomendacao, valor)
+    return valor
 
-# Criar abas
-tab1, tab2 = st.tabs(["Informações do Usuário", "Resultados"])
+# Exibe a recomendação: o texto final da session state ou o andamento da tarefa da sessão
+def exibir_recomendacao(chave_estado, dados_usuario, tipo_recomendacao):
+    if st.session_state.get(chave_estado) is not None:
+        exibir_plano_ou_texto(tipo_recomendacao, st.session_state[chave_estado])
+        return
+    
+    area = st.empty()
+    try:
+        texto = None
+        geracao = obter_tabela_tarefas().consultar(obter_id_sessao(), chave_estado)
+        if geracao is None:
+            # Sem tarefa na tabela (ainda não iniciada ou já expirada): pedir de novo
+            texto, geracao = obter_ou_iniciar_geracao(dados_usuario, tipo_recomendacao, chave_estado)
+        if geracao is not None:
+            texto = acompanhar_tarefa(geracao, area)
+            if PLANOS_ESTRUTURADOS:
+                from planos import texto_para_plano
+                texto = texto_para_plano(tipo_recomendacao, texto)
+        st.session_state[chave_estado] = texto
+        with area.container():
+            exibir_plano_ou_texto(tipo_recomendacao, texto)
+    except Exception as e:
+        area.empty()
+        st.session_state[chave_estado] = tratar_erro_llm(e, dados_usuario, tipo_recomendacao)
+        exibir_plano_ou_texto(tipo_recomendacao, st.session_state[chave_estado])
+    obter_tabela_tarefas().liberar(obter_id_sessao(), chave_estado)
 
-with tab1:
-    st.markdown("## Insira seus dados")
+# Métricas como são exibidas (na página e no PDF)
+def formatar_metricas(metricas):
+    return {
+        "IMC": f"{metricas['imc']}",
+        "Status IMC": f"{metricas['status_imc']}",
+        "Gordura corporal estimada": f"{metricas['bf_est']}%",
+        "Taxa Metabólica Basal": f"{int(metricas['tmb'])} kcal",
+        "Necessidade para ganho de massa": f"{int(metricas['calorias_ganho'])} kcal",
+        "Proteína diária recomendada": f"{int(metricas['proteina_diaria'])}g",
+    }
+
+# Resumo dos dados e métricas: cada coluna é um único elemento de markdown
+@cronometrado("resumo_metricas")
+def exibir_metricas(dados_usuario):
+    # Mostrar informações do usuário
+    with st.expander("Resumo dos seus dados", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        
+        col1.markdown(
+            f"**Sexo:** {dados_usuario['sexo']}\n\n"
+            f"**Idade:** {dados_usuario['idade']} anos\n\n"
+            f"**Peso:** {dados_usuario['peso']} kg\n\n"
+            f"**Altura:** {dados_usuario['altura']} cm"
+        )
+        col2.markdown("**Medidas:**\n\n" + "\n".join(
+            f"- {parte}: {medida} cm" for parte, medida in dados_usuario['medidas'].items()
+        ))
+        col3.markdown(
+            f"**Áreas de foco:** {', '.join(dados_usuario['membros_foco'])}\n\n"
+            f"**Tipo de treino:** {dados_usuario['tipo_treino']}\n\n"
+            f"**Nível:** {dados_usuario['nivel']}\n\n"
+            f"**Dias de treino:** {dados_usuario['dias_treino']}"
+        )
     
+    # IMC e outras métricas
+    st.markdown('<div class="info-box">', unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     
-    with col1:
-        sexo = st.selectbox("Sexo:", ["Masculino", "Feminino"])
-        idade = st.number_input("Idade:", min_value=16, max_value=80, value=30)
-        peso = st.number_input("Peso (kg):", min_value=40.0, max_value=150.0, value=70.0, step=0.1)
-        altura = st.number_input("Altura (cm):", min_value=140, max_value=220, value=170)
+    # Cálculo do IMC, BF%, TMB e necessidades (mesmo código usado nos relatórios em lote)
+    from metricas_corporais import calcular_metricas_usuario
+    metricas = formatar_metricas(calcular_metricas_usuario(dados_usuario))
+    linhas = [f"**{rotulo}:** {valor}" for rotulo, valor in metricas.items()]
     
+    with col1:
+        st.subheader("Métricas")
+        st.markdown("\n\n".join(linhas[:3]))
+        
     with col2:
-        st.markdown("### Medidas dos membros (cm)")
-        bracos = st.number_input("Braços (circunferência):", min_value=20.0, max_value=60.0, value=30.0, step=0.5)
-        peito = st.number_input("Peito (circunferência):", min_value=70.0, max_value=150.0, value=90.0, step=0.5)
-        cintura = st.number_input("Cintura (circunferência):", min_value=60.0, max_value=150.0, value=80.0, step=0.5)
-        quadril = st.number_input("Quadril (circunferência):", min_value=70.0, max_value=150.0, value=95.0, step=0.5)
-        coxas = st.number_input("Coxas (circunferência):", min_value=40.0, max_value=100.0, value=55.0, step=0.5)
-        gluteos = st.number_input("Glúteos (circunferência):", min_value=70.0, max_value=150.0, value=100.0, step=0.5)
+        st.subheader("Necessidades Energéticas")
+        st.markdown("\n\n".join(linhas[3:]))
         
-    st.markdown("### Objetivos")
-    membros_foco = st.multiselect(
-        "Quais áreas você deseja focar?",
-        ["Peito", "Costas", "Pernas", "Braços", "Ombros", "Glúteos"],
-        default=["Peito", "Braços"]
+    st.markdown('</div>', unsafe_allow_html=True)
+    return metricas
+
+# Plano alimentar e programa de treino em um fragmento: os botões de download
+# executam só este trecho, sem refazer o formulário e o restante da página
+@st.fragment
+@cronometrado("fragmento_planos")
+def exibir_planos(dados_usuario, metricas):
+    resultados_tab1, resultados_tab2 = st.tabs(["Plano Alimentar", "Programa de Treino"])
+    planos = (
+        (resultados_tab1, 'dieta_recomendacao', "dieta", "Gerando plano alimentar personalizado...", "Baixar Plano Alimentar", "plano_alimentar"),
+        (resultados_tab2, 'treino_recomendacao', "programa de treino", "Gerando programa de treino personalizado...", "Baixar Programa de Treino", "programa_treino"),
     )
+    for aba, chave_estado, tipo_recomendacao, mensagem_espera, rotulo_download, prefixo_arquivo in planos:
+        with aba:
+            st.markdown('<div class="result-section">', unsafe_allow_html=True)
+            
+            with st.spinner(mensagem_espera):
+                exibir_recomendacao(chave_estado, dados_usuario, tipo_recomendacao)
+                
+                # Opção para baixar o plano (o estruturado vai como JSON)
+                estruturado = isinstance(st.session_state[chave_estado], bytes)
+                st.download_button(
+                    label=rotulo_download,
+                    data=st.session_state[chave_estado],
+                    file_name=f"{prefixo_arquivo}_{datetime.now().strftime('%Y%m%d')}.{'json' if estruturado else 'txt'}",
+                    mime="application/json" if estruturado else "text/plain"
+                )
+            
+            st.markdown('</div>', unsafe_allow_html=True)
     
-    tipo_treino = st.radio(
-        "Preferência de treino:",
-        ["Com aparelhos", "Sem aparelhos (calistenia, elásticos, etc.)"]
+    # PDF com as métricas e os dois planos, quando ambos estiverem prontos
+    dieta = st.session_state.get('dieta_recomendacao')
+    treino = st.session_state.get('treino_recomendacao')
+    if dieta and treino:
+        exibir_download_pdf(em_markdown("dieta", dieta), em_markdown("programa de treino", treino), metricas)
+        # Planos desta geração ainda não gravados no histórico do usuário (os estruturados como JSON)
+        usuario = st.session_state.pop('planos_a_salvar', None)
+        if usuario:
+            planos_usuario = {
+                tipo: plano.decode("utf-8") if isinstance(plano, bytes) else plano
+                for tipo, plano in (("dieta", dieta), ("programa de treino", treino))
+            }
+            salvar_no_historico(lambda historico: historico.salvar_planos(usuario, planos_usuario))
+
+# O PDF é renderizado no pool de exportação e guardado pelo hash do conteúdo: nos reruns
+# o botão recebe os mesmos bytes, sem gerar o documento de novo. A execução do script não
+# espera a renderização: enquanto ela não termina, um fragmento consulta o futuro
+def exibir_download_pdf(dieta, treino, metricas):
+    futuro = obter_exportador_pdf().solicitar(dieta, treino, metricas)
+    if not futuro.done():
+        aguardar_pdf(futuro)
+        return
+    if futuro.exception() is not None:
+        st.error(f"Erro ao gerar o PDF: {str(futuro.exception())}")
+        return
+    conteudo = futuro.result()
+    st.download_button(
+        label="Baixar PDF Completo",
+        data=conteudo,
+        file_name=f"musclegainer_{datetime.now().strftime('%Y%m%d')}.pdf",
+        mime="application/pdf",
+        type="primary",
     )
+
+# Aviso no lugar do botão enquanto o PDF é renderizado. Pronto o PDF, a página roda de novo por
+# inteiro: o botão aparece e a execução completa encerra as consultas periódicas do fragmento
+@st.fragment(run_every=PDF_INTERVALO_CONSULTA)
+def aguardar_pdf(futuro):
+    if futuro.done():
+        st.rerun()
+    st.info("Preparando o PDF completo...")
+
+# Tamanho mínimo da senha do histórico
+SENHA_MINIMA = 6
+
+# Confere a senha do histórico (registrada no primeiro uso do identificador) e devolve o instante
+# do registro, ou None quando o histórico não deve ser gravado nem exibido
+def autenticar_historico(usuario, senha):
+    from historico import AcessoNegado, obter_historico
+    if len(senha) < SENHA_MINIMA:
+        st.warning(f"Defina uma senha de pelo menos {SENHA_MINIMA} caracteres para salvar e ver seu histórico.")
+        return None
+    try:
+        return obter_historico().autenticar(usuario, senha)
+    except AcessoNegado as e:
+        st.error(f"{str(e)} O histórico não foi salvo nem exibido.")
+    except Exception as e:
+        st.warning(f"Não foi possível acessar seu histórico: {str(e)}")
+    return None
+
+# O histórico é opcional: uma falha ao gravar não interrompe a geração
+def salvar_no_historico(gravar):
+    from historico import obter_historico
+    try:
+        gravar(obter_historico())
+    except Exception as e:
+        st.warning(f"Não foi possível salvar no seu histórico: {str(e)}")
+        return False
+    return True
+
+# Períodos da tela de progresso (em dias; None = todo o histórico)
+PERIODOS_PROGRESSO = {"Últimos 3 meses": 91, "Últimos 6 meses": 182, "Último ano": 365, "Tudo": None}
+
+# Evolução das medidas: uma consulta por faixa no índice (usuario, data) por execução do fragmento,
+# que roda sozinho ao trocar o período. Medidas anteriores ao registro da senha foram gravadas quando
+# qualquer um podia usar o identificador, então ficam de fora
+@st.fragment
+@cronometrado("fragmento_progresso")
+def exibir_progresso(usuario, desde):
+    from historico import COLUNAS_MEDIDAS, obter_historico
     
-    nivel_experiencia = st.select_slider(
-        "Nível de experiência:",
-        options=["Iniciante", "Intermediário", "Avançado"]
-    )
+    periodo = st.radio("Período:", list(PERIODOS_PROGRESSO), index=len(PERIODOS_PROGRESSO) - 1, horizontal=True)
+    dias = PERIODOS_PROGRESSO[periodo]
+    inicio = max(desde, datetime.now() - timedelta(days=dias)) if dias else desde
+    try:
+        historico = obter_historico().carregar_medicoes(usuario, inicio=inicio)
+    except Exception as e:
+        st.error(f"Erro ao carregar o histórico: {str(e)}")
+        return
     
-    dias_treino = st.slider("Quantos dias por semana você pode treinar?", 2, 6, 4)
+    if len(historico) < 2:
+        st.info("Faça novas medidas a cada 4 semanas e gere as recomendações de novo para acompanhar sua evolução aqui.")
+        return
     
-    restricoes_alimentares = st.multiselect(
-        "Restrições alimentares:",
-        ["Nenhuma", "Vegetariano", "Vegano", "Intolerância à lactose", "Celíaco/Sem glúten"],
-        default=["Nenhuma"]
-    )
+    # Variação de cada medida em relação à primeira do período
+    variacao = historico - historico.iloc[0]
+    st.markdown(f"### Variação desde {historico.index[0].strftime('%d/%m/%Y')}")
+    colunas = st.columns(len(historico.columns))
+    rotulos = {coluna: parte for parte, coluna in COLUNAS_MEDIDAS.items()}
+    for coluna, nome in zip(colunas, historico.columns):
+        unidade = "kg" if nome == "peso" else "cm"
+        coluna.metric(rotulos.get(nome, "Peso"), f"{historico[nome].iloc[-1]:g} {unidade}", f"{variacao[nome].iloc[-1]:+g} {unidade}")
     
-    medicoes = {
-        "Braços": bracos,
-        "Peito": peito,
-        "Cintura": cintura,
-        "Quadril": quadril,
-        "Coxas": coxas,
-        "Glúteos": gluteos
-    }
+    st.subheader("Medidas (cm)")
+    st.line_chart(variacao.drop(columns="peso").rename(columns=rotulos))
+    st.subheader("Peso (kg)")
+    st.line_chart(variacao["peso"])
+
+# Carrega os módulos adiados em uma thread, uma única vez por processo
+@st.cache_resource
+def aquecer_importacoes():
+    def importar():
+        for modulo in MODULOS_ADIADOS:
+            importlib.import_module(modulo)
+    if AQUECER_IMPORTACOES:
+        threading.Thread(target=importar, daemon=True, name="aquecimento-importacoes").start()
+
+# Métricas de latência (endpoint Prometheus/arquivo e painel escondido)
+iniciar_exportacao()
+exibir_painel_admin()
+
+# Inicialização de variáveis de estado
+if 'generate_results' not in st.session_state:
+    st.session_state['generate_results'] = False
+
+# Criar abas
+tab1, tab2, tab3 = st.tabs(["Informações do Usuário", "Resultados", "Progresso"])
+
+with tab1:
+    # Os campos ficam em um formulário: alterá-los não executa o script, só o envio
+    with st.form("formulario_usuario", border=False):
+        st.markdown("## Insira seus dados")
+        
+        usuario = st.text_input("E-mail ou apelido (opcional, para salvar seu histórico):", max_chars=120)
+        senha = st.text_input(
+            f"Senha do histórico (definida no primeiro uso, mínimo de {SENHA_MINIMA} caracteres):",
+            type="password",
+            max_chars=120,
+        )
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            sexo = st.selectbox("Sexo:", ["Masculino", "Feminino"])
+            idade = st.number_input("Idade:", min_value=16, max_value=80, value=30)
+            peso = st.number_input("Peso (kg):", min_value=40.0, max_value=150.0, value=70.0, step=0.1)
+            altura = st.number_input("Altura (cm):", min_value=140, max_value=220, value=170)
+        
+        with col2:
+            st.markdown("### Medidas dos membros (cm)")
+            bracos = st.number_input("Braços (circunferência):", min_value=20.0, max_value=60.0, value=30.0, step=0.5)
+            peito = st.number_input("Peito (circunferência):", min_value=70.0, max_value=150.0, value=90.0, step=0.5)
+            cintura = st.number_input("Cintura (circunferência):", min_value=60.0, max_value=150.0, value=80.0, step=0.5)
+            quadril = st.number_input("Quadril (circunferência):", min_value=70.0, max_value=150.0, value=95.0, step=0.5)
+            coxas = st.number_input("Coxas (circunferência):", min_value=40.0, max_value=100.0, value=55.0, step=0.5)
+            gluteos = st.number_input("Glúteos (circunferência):", min_value=70.0, max_value=150.0, value=100.0, step=0.5)
+            
+        st.markdown("### Objetivos")
+        membros_foco = st.multiselect(
+            "Quais áreas você deseja focar?",
+            ["Peito", "Costas", "Pernas", "Braços", "Ombros", "Glúteos"],
+            default=["Peito", "Braços"]
+        )
+        
+        tipo_treino = st.radio(
+            "Preferência de treino:",
+            ["Com aparelhos", "Sem aparelhos (calistenia, elásticos, etc.)"]
+        )
+        
+        nivel_experiencia = st.select_slider(
+            "Nível de experiência:",
+            options=["Iniciante", "Intermediário", "Avançado"]
+        )
+        
+        dias_treino = st.slider("Quantos dias por semana você pode treinar?", 2, 6, 4)
+        
+        restricoes_alimentares = st.multiselect(
+            "Restrições alimentares:",
+            ["Nenhuma", "Vegetariano", "Vegano", "Intolerância à lactose", "Celíaco/Sem glúten"],
+            default=["Nenhuma"]
+        )
+        
+        enviado = st.form_submit_button("Gerar Recomendações", type="primary")
     
-    if st.button("Gerar Recomendações", type="primary"):
+    if enviado:
+        medicoes = {
+            "Braços": bracos,
+            "Peito": peito,
+            "Cintura": cintura,
+            "Quadril": quadril,
+            "Coxas": coxas,
+            "Glúteos": gluteos
+        }
+        
         # Salvando os dados do usuário
         dados_usuario = {
             "sexo": sexo,
@@ -282,201 +453,66 @@ with tab1:
         st.session_state['dieta_recomendacao'] = None
         st.session_state['treino_recomendacao'] = None
         
-        # Alterar para a aba de resultados automaticamente
-        st.rerun()
+        # Iniciar a geração da dieta e do treino em paralelo (os resultados são exibidos
+        # ainda nesta execução, na aba seguinte, sem um rerun extra); se não der para iniciar
+        # aqui, a aba de resultados pede de novo e cai no fallback com a mensagem de erro
+        try:
+            iniciar_recomendacoes_concorrentes(dados_usuario)
+        except Exception:
+            pass
+        
+        # Guardar o perfil e as medidas; os planos são gravados quando ficarem prontos.
+        # Sem a senha certa do identificador, nada é gravado nem exibido
+        usuario = usuario.strip()
+        desde = autenticar_historico(usuario, senha) if usuario else None
+        st.session_state['usuario'] = usuario if desde is not None else None
+        st.session_state['historico_desde'] = desde
+        if desde is not None and salvar_no_historico(lambda historico: historico.salvar_perfil(usuario, dados_usuario)):
+            st.session_state['planos_a_salvar'] = usuario
 
 with tab2:
     if 'generate_results' in st.session_state and st.session_state['generate_results']:
         dados_usuario = st.session_state['dados_usuario']
         
-        st.markdown('<div class="subtitle">Suas recomendações personalizadas</div>', unsafe_allow_html=True)
-        
-        # Mostrar informações do usuário
-        with st.expander("Resumo dos seus dados", expanded=False):
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.write(f"**Sexo:** {dados_usuario['sexo']}")
-                st.write(f"**Idade:** {dados_usuario['idade']} anos")
-                st.write(f"**Peso:** {dados_usuario['peso']} kg")
-                st.write(f"**Altura:** {dados_usuario['altura']} cm")
-            
-            with col2:
-                st.write("**Medidas:**")
-                for parte, medida in dados_usuario['medidas'].items():
-                    st.write(f"- {parte}: {medida} cm")
-            
-            with col3:
-                st.write(f"**Áreas de foco:** {', '.join(dados_usuario['membros_foco'])}")
-                st.write(f"**Tipo de treino:** {dados_usuario['tipo_treino']}")
-                st.write(f"**Nível:** {dados_usuario['nivel']}")
-                st.write(f"**Dias de treino:** {dados_usuario['dias_treino']}")
-        
-        # IMC e outras métricas
-        st.markdown('<div class="info-box">', unsafe_allow_html=True)
-        col1, col2 = st.columns(2)
+        st.markdown(conteudo_estatico.SUBTITULO_RESULTADOS, unsafe_allow_html=True)
         
-        # Cálculo do IMC
-        imc = round(dados_usuario['peso'] / ((dados_usuario['altura']/100) ** 2), 2)
-        
-        with col1:
-            st.subheader("Métricas")
-            st.write(f"**IMC:** {imc}")
-            
-            if imc < 18.5:
-                status_imc = "Abaixo do peso"
-            elif imc < 25:
-                status_imc = "Peso normal"
-            elif imc < 30:
-                status_imc = "Sobrepeso"
-            else:
-                status_imc = "Obesidade"
-                
-            st.write(f"**Status IMC:** {status_imc}")
-            
-            # Estimativa de BF% (muito simplificada)
-            if dados_usuario['sexo'] == "Masculino":
-                bf_est = round(1.20 * imc + 0.23 * dados_usuario['idade'] - 16.2, 1)
-            else:
-                bf_est = round(1.20 * imc + 0.23 * dados_usuario['idade'] - 5.4, 1)
-                
-            bf_est = max(5, min(bf_est, 40))  # limitar valores impossíveis
-            st.write(f"**Gordura corporal estimada:** {bf_est}%")
-            
-        with col2:
-            # Cálculo da taxa metabólica basal (TMB) usando fórmula de Harris-Benedict
-            if dados_usuario['sexo'] == "Masculino":
-                tmb = 88.362 + (13.397 * dados_usuario['peso']) + (4.799 * dados_usuario['altura']) - (5.677 * dados_usuario['idade'])
-            else:
-                tmb = 447.593 + (9.247 * dados_usuario['peso']) + (3.098 * dados_usuario['altura']) - (4.330 * dados_usuario['idade'])
-                
-            st.subheader("Necessidades Energéticas")
-            st.write(f"**Taxa Metabólica Basal:** {int(tmb)} kcal")
-            st.write(f"**Necessidade para ganho de massa:** {int(tmb * 1.5)} kcal")
-            st.write(f"**Proteína diária recomendada:** {int(dados_usuario['peso'] * 2)}g")
-            
-        st.markdown('</div>', unsafe_allow_html=True)
+        metricas = exibir_metricas(dados_usuario)
         
         # Abas para dieta e treino
-        resultados_tab1, resultados_tab2 = st.tabs(["Plano Alimentar", "Programa de Treino"])
-        
-        with resultados_tab1:
-            st.markdown('<div class="result-section">', unsafe_allow_html=True)
-            
-            with st.spinner("Gerando plano alimentar personalizado..."):
-                if 'dieta_recomendacao' not in st.session_state or st.session_state['dieta_recomendacao'] is None:
-                    st.session_state['dieta_recomendacao'] = gerar_recomendacao_llm(dados_usuario, "dieta")
-                
-                st.markdown(st.session_state['dieta_recomendacao'])
-                
-                # Opção para baixar a dieta
-                dieta_texto = st.session_state['dieta_recomendacao']
-                st.download_button(
-                    label="Baixar Plano Alimentar",
-                    data=dieta_texto,
-                    file_name=f"plano_alimentar_{datetime.now().strftime('%Y%m%d')}.txt",
-                    mime="text/plain"
-                )
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        with resultados_tab2:
-            st.markdown('<div class="result-section">', unsafe_allow_html=True)
-            
-            with st.spinner("Gerando programa de treino personalizado..."):
-                if 'treino_recomendacao' not in st.session_state or st.session_state['treino_recomendacao'] is None:
-                    st.session_state['treino_recomendacao'] = gerar_recomendacao_llm(dados_usuario, "programa de treino")
-                
-                st.markdown(st.session_state['treino_recomendacao'])
-                
-                # Opção para baixar o treino
-                treino_texto = st.session_state['treino_recomendacao']
-                st.download_button(
-                    label="Baixar Programa de Treino",
-                    data=treino_texto,
-                    file_name=f"programa_treino_{datetime.now().strftime('%Y%m%d')}.txt",
-                    mime="text/plain"
-                )
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+        exibir_planos(dados_usuario, metricas)
         
         # Dicas adicionais e considerações
         st.markdown("### Dicas importantes")
-        st.info("""
-            - **Consistência é a chave:** Siga o plano por pelo menos 8-12 semanas para ver resultados significativos.
-            - **Progressão:** Aumente gradualmente a carga nos exercícios conforme sua força aumenta.
-            - **Descanso:** Garanta 7-9 horas de sono por noite para maximizar a recuperação muscular.
-            - **Hidratação:** Beba pelo menos 35ml de água por kg de peso corporal diariamente.
-            - **Monitoramento:** Faça novas medidas a cada 4 semanas para acompanhar seu progresso.
-        """)
+        st.info(conteudo_estatico.DICAS)
         
         # Aviso sobre consulta profissional
-        st.warning("""
-            **Importante:** Este plano é uma sugestão baseada nas informações fornecidas. 
-            Para resultados ótimos e seguros, consulte um nutricionista e um profissional de educação física.
-        """)
+        st.warning(conteudo_estatico.AVISO_PROFISSIONAL)
     else:
         # Conteúdo para exibir quando o app é iniciado pela primeira vez
-        st.info("👈 Por favor, preencha suas informações na aba 'Informações do Usuário' e clique em 'Gerar Recomendações' para visualizar seus resultados personalizados.")
+        st.info(conteudo_estatico.CONVITE)
         
         # Explicação sobre o aplicativo
-        st.markdown("## Como funciona o MuscleGainer App")
-        st.markdown("""
-        Este aplicativo foi projetado para ajudar você a atingir seus objetivos de ganho de massa muscular, oferecendo:
-        
-        1. **Plano alimentar personalizado** - Com base nas suas características físicas e objetivos
-        2. **Programa de treino específico** - Focado nos grupos musculares que você deseja desenvolver
-        3. **Opções adaptáveis** - Com ou sem equipamentos de musculação
-        4. **Métricas úteis** - Cálculos de IMC, gordura corporal estimada e necessidades calóricas
-        
-        Ao preencher seus dados na aba anterior, nosso sistema irá gerar recomendações personalizadas para você.
-        """)
+        st.markdown(conteudo_estatico.COMO_FUNCIONA)
         
         # Informações adicionais
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("### Benefícios do ganho de massa muscular")
-            st.markdown("""
-            - Aumento da força e resistência física
-            - Melhora do metabolismo e queima calórica
-            - Prevenção de lesões e melhora da postura
-            - Aumento da densidade óssea
-            - Melhora da autoestima e confiança
-            """)
-        
-        with col2:
-            st.markdown("### Fatores importantes para hipertrofia")
-            st.markdown("""
-            - **Volume de treino adequado** - Número de séries e repetições
-            - **Intensidade progressiva** - Aumento gradual das cargas
-            - **Alimentação rica em proteínas** - Para reconstrução muscular
-            - **Descanso adequado** - Recuperação entre treinos
-            - **Consistência** - Manter a rotina a longo prazo
-            """)
+        for coluna, texto in zip(st.columns(2), conteudo_estatico.BENEFICIOS_E_FATORES):
+            coluna.markdown(texto)
         
         # Informações sobre grupos musculares
-        st.markdown("### Principais Grupos Musculares")
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown("""
-            #### Peito, Costas e Ombros
-            O desenvolvimento destes músculos contribui para uma postura melhor e uma aparência mais larga e atlética.
-            """)
-        
-        with col2:
-            st.markdown("""
-            #### Braços e Pernas
-            Braços fortes e pernas desenvolvidas são fundamentais para um físico equilibrado e funcional, além de melhorar o desempenho em atividades diárias.
-            """)
-        
-        with col3:
-            st.markdown("""
-            #### Glúteos
-            Os glúteos são um dos maiores grupos musculares do corpo. Seu fortalecimento melhora a estabilidade pélvica, potência de salto e corrida, além dos benefícios estéticos.
-            """)
+        st.markdown(conteudo_estatico.TITULO_GRUPOS_MUSCULARES)
+        for coluna, texto in zip(st.columns(3), conteudo_estatico.GRUPOS_MUSCULARES):
+            coluna.markdown(texto)
+
+with tab3:
+    if st.session_state.get('usuario'):
+        exibir_progresso(st.session_state['usuario'], st.session_state['historico_desde'])
+    else:
+        st.info("Informe um e-mail ou apelido e a senha do histórico na aba 'Informações do Usuário' para salvar suas medidas e acompanhar sua evolução aqui.")
 
 # Rodapé
-st.markdown("---")
-st.markdown("MuscleGainer App | Desenvolvido para ajudar você a atingir seus objetivos de ganho de massa muscular")
\ No newline at end of file
+st.markdown(conteudo_estatico.RODAPE)
+
+registrar_duracao("execucao_script", time.perf_counter() - inicio_execucao)
+
+# Fora da medição acima: a página já foi enviada quando as importações adiadas começam
+aquecer_importacoes()
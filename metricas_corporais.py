@@ -0,0 +1,111 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Faixas do IMC: abaixo de 18.5, até 25, até 30 e acima
+LIMITES_IMC = [18.5, 25, 30]
+CATEGORIAS_IMC = ["Abaixo do peso", "Peso normal", "Sobrepeso", "Obesidade"]
+
+# Fator de atividade para o superávit calórico e gramas de proteína por kg
+FATOR_GANHO_MASSA = 1.5
+PROTEINA_POR_KG = 2
+
+COLUNAS_ENTRADA = ["sexo", "idade", "peso", "altura"]
+
+# Calcula todas as métricas de uma vez para arrays (ou listas/Series) do mesmo tamanho
+def calcular_metricas(sexo, idade, peso, altura):
+    masculino = np.asarray(sexo) == "Masculino"
+    idade = np.asarray(idade, dtype=float)
+    peso = np.asarray(peso, dtype=float)
+    altura = np.asarray(altura, dtype=float)
+
+    # Cálculo do IMC
+    imc = np.round(peso / (altura / 100) ** 2, 2)
+    codigos = np.searchsorted(LIMITES_IMC, imc, side="right")
+    codigos = np.where(np.isnan(imc), -1, codigos)
+    status_imc = pd.Categorical.from_codes(codigos, CATEGORIAS_IMC)
+
+    # Estimativa de BF% (muito simplificada), limitada a valores possíveis
+    bf_est = np.round(1.20 * imc + 0.23 * idade - np.where(masculino, 16.2, 5.4), 1)
+    bf_est = np.clip(bf_est, 5, 40)
+
+    # Taxa metabólica basal (TMB) pela fórmula de Harris-Benedict
+    tmb = np.where(
+        masculino,
+        88.362 + (13.397 * peso) + (4.799 * altura) - (5.677 * idade),
+        447.593 + (9.247 * peso) + (3.098 * altura) - (4.330 * idade),
+    )
+
+    return {
+        "imc": imc,
+        "status_imc": status_imc,
+        "bf_est": bf_est,
+        "tmb": tmb,
+        "calorias_ganho": tmb * FATOR_GANHO_MASSA,
+        "proteina_diaria": peso * PROTEINA_POR_KG,
+    }
+
+# Versão para DataFrame: devolve uma cópia com as colunas derivadas
+def calcular_metricas_df(df):
+    metricas = calcular_metricas(df["sexo"], df["idade"], df["peso"], df["altura"])
+    return df.assign(**{coluna: valores for coluna, valores in metricas.items()})
+
+# Métricas de um único usuário como valores escalares (usado pela página)
+def calcular_metricas_usuario(dados_usuario):
+    metricas = calcular_metricas(
+        [dados_usuario['sexo']],
+        [dados_usuario['idade']],
+        [dados_usuario['peso']],
+        [dados_usuario['altura']],
+    )
+    return {coluna: valores[0] for coluna, valores in metricas.items()}
+
+# Lê o arquivo em lotes para manter a memória limitada, qualquer que seja o tamanho da base
+def ler_em_lotes(caminho, tamanho_lote):
+    if Path(caminho).suffix == ".parquet":
+        arquivo = pq.ParquetFile(caminho)
+        for lote in arquivo.iter_batches(batch_size=tamanho_lote):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, chunksize=tamanho_lote)
+
+def processar_arquivo(entrada, saida, tamanho_lote=100_000):
+    saida_parquet = Path(saida).suffix == ".parquet"
+    escritor = None
+    linhas = 0
+    try:
+        for lote in ler_em_lotes(entrada, tamanho_lote):
+            faltando = set(COLUNAS_ENTRADA) - set(lote.columns)
+            if faltando:
+                raise ValueError(f"Colunas ausentes na entrada: {', '.join(sorted(faltando))}")
+            resultado = calcular_metricas_df(lote)
+            if saida_parquet:
+                tabela = pa.Table.from_pandas(resultado, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(saida, tabela.schema)
+                # Lotes de CSV podem inferir tipos diferentes (ex.: int num lote, float com NaN no outro)
+                escritor.write_table(tabela.cast(escritor.schema))
+            else:
+                resultado.to_csv(saida, mode="w" if linhas == 0 else "a", header=linhas == 0, index=False)
+            linhas += len(resultado)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return linhas
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula IMC, BF%, TMB, calorias e proteína para uma base de membros")
+    parser.add_argument("entrada", help="arquivo .csv ou .parquet com as colunas sexo, idade, peso e altura")
+    parser.add_argument("saida", help="arquivo .csv ou .parquet de saída")
+    parser.add_argument("--tamanho-lote", type=int, default=100_000)
+    args = parser.parse_args()
+
+    linhas = processar_arquivo(args.entrada, args.saida, args.tamanho_lote)
+    print(f"{linhas} linhas processadas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import json
+import os
+import threading
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.logger import get_logger
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_random_exponential,
+)
+
+from instrumentacao import contar, medir, registrar_duracao
+from limitador import FilaCheia
+
+logger = get_logger(__name__)
+
+# Configuração do cliente HTTP (pode ser sobrescrita por variáveis de ambiente)
+OPENROUTER_URL = os.environ.get("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+TIMEOUT_CONEXAO = float(os.environ.get("OPENROUTER_TIMEOUT_CONEXAO", "5"))
+TIMEOUT_LEITURA = float(os.environ.get("OPENROUTER_TIMEOUT_LEITURA", "60"))
+MAX_TENTATIVAS = int(os.environ.get("OPENROUTER_MAX_TENTATIVAS", "4"))
+ORCAMENTO_RETENTATIVAS = float(os.environ.get("OPENROUTER_ORCAMENTO_RETENTATIVAS", "90"))
+BACKOFF_INICIAL = float(os.environ.get("OPENROUTER_BACKOFF_INICIAL", "1"))
+BACKOFF_MAXIMO = float(os.environ.get("OPENROUTER_BACKOFF_MAXIMO", "20"))
+TAMANHO_POOL = int(os.environ.get("OPENROUTER_TAMANHO_POOL", "32"))
+MODO_STREAMING = os.environ.get("OPENROUTER_STREAMING", "1") == "1"
+
+# Códigos HTTP que indicam falha temporária do upstream
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+# Sessão HTTP compartilhada entre reruns e sessões (mantém as conexões abertas)
+@st.cache_resource
+def obter_sessao_http():
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=TAMANHO_POOL)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    sessao.headers.update({
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://musclegainer.com",
+        "X-Title": "MuscleGainer",
+    })
+    return sessao
+
+def obter_chave_api():
+    return os.environ.get("OPENROUTER_API_KEY") or st.secrets["qwen_key"]
+
+# Só vale a pena tentar de novo em 429/5xx e em falhas de conexão
+def deve_retentar(erro):
+    if isinstance(erro, requests.HTTPError):
+        return erro.response is not None and erro.response.status_code in STATUS_RETENTAVEIS
+    return isinstance(erro, requests.ConnectionError)
+
+retentar_upstream = retry(
+    retry=retry_if_exception(deve_retentar),
+    wait=wait_random_exponential(multiplier=BACKOFF_INICIAL, max=BACKOFF_MAXIMO),
+    stop=stop_after_attempt(MAX_TENTATIVAS) | stop_after_delay(ORCAMENTO_RETENTATIVAS),
+    reraise=True,
+)
+
+# Uma tentativa de requisição, contando o status e o tempo até os cabeçalhos da resposta
+# (sem `url`, vai para o OPENROUTER_URL). Com a `senha` do limitador, cada tentativa, inclusive
+# as retentativas, espera uma ficha antes de ir ao upstream
+def _postar(sessao, corpo, chave_api, timeout, stream=False, url=None, senha=None):
+    if senha is not None:
+        senha.aguardar()
+    try:
+        response = sessao.post(
+            url=url or OPENROUTER_URL,
+            headers={"Authorization": "Bearer " + chave_api},
+            data=json.dumps(corpo),
+            timeout=timeout or (TIMEOUT_CONEXAO, TIMEOUT_LEITURA),
+            stream=stream,
+        )
+    except requests.RequestException as e:
+        contar("upstream_status", status=type(e).__name__)
+        raise
+    contar("upstream_status", status=response.status_code)
+    registrar_duracao("upstream_primeiro_byte", response.elapsed.total_seconds())
+    response.raise_for_status()
+    return response
+
+# Tokens de cada chamada (campo "usage" do OpenRouter) nos contadores e no log
+def registrar_uso(payload, uso, motivo_fim):
+    if uso:
+        contar("tokens", uso.get("prompt_tokens", 0), tipo="prompt")
+        contar("tokens", uso.get("completion_tokens", 0), tipo="completion")
+    if motivo_fim == "length":
+        # Resposta cortada pelo max_tokens: sinal de que o orçamento do tipo está curto
+        contar("resposta_truncada")
+    logger.info(
+        "chat completion modelo=%s prompt_tokens=%s completion_tokens=%s max_tokens=%s finish_reason=%s",
+        payload.get("model"),
+        (uso or {}).get("prompt_tokens"),
+        (uso or {}).get("completion_tokens"),
+        payload.get("max_tokens"),
+        motivo_fim,
+    )
+
+@retentar_upstream
+def enviar_chat_completion(payload, chave_api, sessao=None, timeout=None, senha=None):
+    # Threads de trabalho devem receber a sessão já obtida na thread do script
+    sessao = sessao or obter_sessao_http()
+    with medir("upstream_requisicao"):
+        response = _postar(sessao, payload, chave_api, timeout, senha=senha)
+    return ler_resposta_chat_completion(response, payload)
+
+def ler_resposta_chat_completion(response, payload):
+    with medir("decodificacao_json"):
+        resposta = response.json()
+    registrar_uso(payload, resposta.get("usage"), resposta["choices"][0].get("finish_reason"))
+    return resposta
+
+# As retentativas só cobrem a abertura do stream, antes do primeiro trecho
+@retentar_upstream
+def abrir_stream_chat_completion(payload, chave_api, sessao, senha=None):
+    return _postar(sessao, {**payload, "stream": True}, chave_api, None, stream=True, senha=senha)
+
+# Lê os eventos SSE do OpenRouter e devolve os trechos de texto conforme chegam
+def transmitir_chat_completion(payload, chave_api, sessao=None, senha=None):
+    sessao = sessao or obter_sessao_http()
+    inicio = time.perf_counter()
+    yield from ler_stream_chat_completion(abrir_stream_chat_completion(payload, chave_api, sessao, senha), payload, inicio)
+
+def ler_stream_chat_completion(response, payload, inicio):
+    primeiro_trecho = True
+    uso = None
+    motivo_fim = None
+    with response:
+        for linha in response.iter_lines():
+            linha = linha.decode("utf-8")
+            # Linhas vazias separam eventos e linhas com ":" são comentários de keep-alive
+            if not linha.startswith("data:"):
+                continue
+            dados = linha[len("data:"):].strip()
+            if dados == "[DONE]":
+                break
+            evento = json.loads(dados)
+            if "error" in evento:
+                raise RuntimeError(evento["error"].get("message", "Erro no stream do OpenRouter"))
+            # O último evento traz o "usage" (às vezes sem escolhas)
+            uso = evento.get("usage") or uso
+            escolha = (evento.get("choices") or [{}])[0]
+            motivo_fim = escolha.get("finish_reason") or motivo_fim
+            trecho = escolha.get("delta", {}).get("content")
+            if trecho:
+                if primeiro_trecho:
+                    registrar_duracao("upstream_primeiro_trecho", time.perf_counter() - inicio)
+                    primeiro_trecho = False
+                yield trecho
+    registrar_duracao("upstream_stream_completo", time.perf_counter() - inicio)
+    registrar_uso(payload, uso, motivo_fim)
+
+# Texto de uma geração que roda em outra thread; pode ser acompanhado do início a qualquer momento
+class GeracaoEmAndamento:
+    def __init__(self):
+        self.trechos = []
+        self.erro = None
+        self.concluida = False
+        # Lugar na fila do limitador enquanto a geração não foi liberada
+        self.senha = None
+        self._condicao = threading.Condition()
+        self._callbacks = []
+
+    @property
+    def texto(self):
+        return "".join(self.trechos)
+
+    def adicionar(self, trecho):
+        with self._condicao:
+            self.trechos.append(trecho)
+            self._condicao.notify_all()
+
+    def finalizar(self, erro=None):
+        with self._condicao:
+            self.erro = erro
+            self.concluida = True
+            self._condicao.notify_all()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    # Registra uma função chamada (com a geração) quando ela terminar, com ou sem erro
+    def ao_finalizar(self, callback):
+        with self._condicao:
+            if not self.concluida:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    # Espera até haver mais que `lidos` trechos ou a geração terminar, por no máximo `timeout` segundos
+    def aguardar(self, lidos, timeout):
+        with self._condicao:
+            self._condicao.wait_for(lambda: len(self.trechos) > lidos or self.concluida, timeout)
+
+    def acompanhar(self):
+        lidos = 0
+        while True:
+            with self._condicao:
+                while lidos == len(self.trechos) and not self.concluida:
+                    self._condicao.wait()
+                novos = self.trechos[lidos:]
+                lidos += len(novos)
+                concluida = self.concluida
+            yield from novos
+            if concluida:
+                break
+        if self.erro is not None:
+            raise self.erro
+
+def _executar_geracao(geracao, payload, chave_api, sessao, streaming, ao_concluir, roteador):
+    # A senha vai até cada requisição ao upstream (a espera pela primeira ficha acontece lá)
+    try:
+        if roteador is not None:
+            for trecho in roteador.transmitir(payload, chave_api, sessao, streaming, geracao.senha):
+                geracao.adicionar(trecho)
+        elif streaming:
+            for trecho in transmitir_chat_completion(payload, chave_api, sessao, geracao.senha):
+                geracao.adicionar(trecho)
+        else:
+            resposta = enviar_chat_completion(payload, chave_api, sessao, senha=geracao.senha)
+            geracao.adicionar(resposta["choices"][0]["message"]["content"])
+    except Exception as e:
+        geracao.finalizar(e)
+        return
+    finally:
+        # Uma falha antes da primeira requisição deixaria o lugar ocupando a fila para sempre
+        if geracao.senha is not None:
+            geracao.senha.sair()
+    # O resultado vai para o cache antes de a geração sair da lista de gerações em andamento; um erro
+    # em ao_concluir (resposta fora do formato pedido) conta como falha da geração
+    try:
+        if ao_concluir is not None:
+            ao_concluir(geracao.texto)
+    except Exception as e:
+        geracao.finalizar(e)
+        return
+    geracao.finalizar()
+
+# Inicia a geração no executor e devolve o objeto que acumula o texto
+# (com um roteador, o modelo e o endpoint de cada pedido são escolhidos por ele)
+def gerar_em_segundo_plano(executor, payload, chave_api, sessao, streaming=MODO_STREAMING, ao_concluir=None, limitador=None, roteador=None):
+    geracao = GeracaoEmAndamento()
+    if limitador is not None:
+        try:
+            geracao.senha = limitador.entrar()
+        except FilaCheia as e:
+            # Com a fila cheia a geração já nasce com erro e o fallback é usado na hora
+            geracao.finalizar(e)
+            return geracao
+    executor.submit(_executar_geracao, geracao, payload, chave_api, sessao, streaming, ao_concluir, roteador)
+    return geracao
@@ -0,0 +1,244 @@
+from functools import lru_cache
+
+import orjson
+import streamlit as st
+from pydantic import BaseModel, Field, ValidationError
+
+from instrumentacao import contar, cronometrado
+from recomendacoes import CATALOGO_EXERCICIOS, COM_APARELHOS
+
+# Planos estruturados: o LLM responde em JSON, validado pelos esquemas abaixo; os planos circulam
+# (cache, session state, histórico, lote) como bytes compactos do orjson e são exibidos em tabelas
+
+class Exercicio(BaseModel):
+    nome: str
+    series: int = Field(ge=1, le=10)
+    repeticoes: str
+    descanso_s: int | None = Field(default=None, ge=0, le=600)
+
+class DiaTreino(BaseModel):
+    dia: str
+    foco: str
+    exercicios: list[Exercicio] = Field(min_length=1)
+
+class PlanoTreino(BaseModel):
+    dias: list[DiaTreino] = Field(min_length=1)
+    observacoes: list[str] = []
+
+class Alimento(BaseModel):
+    nome: str
+    quantidade: str
+    kcal: float = Field(ge=0)
+    proteinas_g: float = Field(ge=0)
+    carboidratos_g: float = Field(ge=0)
+    gorduras_g: float = Field(ge=0)
+
+class Refeicao(BaseModel):
+    nome: str
+    alimentos: list[Alimento] = Field(min_length=1)
+
+class PlanoAlimentar(BaseModel):
+    calorias_diarias: int = Field(ge=0)
+    proteinas_g: int = Field(ge=0)
+    carboidratos_g: int = Field(ge=0)
+    gorduras_g: int = Field(ge=0)
+    refeicoes: list[Refeicao] = Field(min_length=1)
+    observacoes: list[str] = []
+
+ESQUEMAS = {"dieta": PlanoAlimentar, "programa de treino": PlanoTreino}
+
+# Esqueleto do JSON pedido no prompt (mais curto que o JSON Schema, que vai no response_format)
+ESQUELETOS = {
+    "dieta": (
+        '{"calorias_diarias":0,"proteinas_g":0,"carboidratos_g":0,"gorduras_g":0,"refeicoes":[{"nome":"",'
+        '"alimentos":[{"nome":"","quantidade":"","kcal":0,"proteinas_g":0,"carboidratos_g":0,"gorduras_g":0}]}],"observacoes":[""]}'
+    ),
+    "programa de treino": (
+        '{"dias":[{"dia":"","foco":"","exercicios":[{"nome":"","series":0,"repeticoes":"","descanso_s":0}]}],"observacoes":[""]}'
+    ),
+}
+
+def instrucao_formato(tipo_recomendacao):
+    return f"Responda apenas com um JSON neste formato, sem markdown: {ESQUELETOS[tipo_recomendacao]}"
+
+@lru_cache(maxsize=None)
+def formato_resposta(tipo_recomendacao):
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": tipo_recomendacao.replace(" ", "_"), "schema": ESQUEMAS[tipo_recomendacao].model_json_schema()},
+    }
+
+# Valida o texto do LLM (ignorando cercas de código ou texto em volta do objeto) e devolve os bytes compactos
+@cronometrado("validacao_plano")
+def texto_para_plano(tipo_recomendacao, texto):
+    inicio, fim = texto.find("{"), texto.rfind("}")
+    if inicio < 0 or fim < inicio:
+        raise ValueError("Resposta do LLM sem um objeto JSON")
+    try:
+        plano = ESQUEMAS[tipo_recomendacao].model_validate(orjson.loads(texto[inicio:fim + 1]))
+    except ValidationError as e:
+        raise ValueError(f"Resposta do LLM fora do esquema do plano ({e.error_count()} campos inválidos)") from e
+    return orjson.dumps(plano.model_dump())
+
+# ao_concluir das gerações estruturadas: só planos válidos vão para o cache. O ValueError de um
+# plano inválido encerra a geração com erro, e a tarefa é refeita no próximo pedido do perfil
+def guardar_plano(cache, chave, tipo_recomendacao, texto):
+    try:
+        plano = texto_para_plano(tipo_recomendacao, texto)
+    except ValueError:
+        contar("plano_invalido", tipo=tipo_recomendacao)
+        raise
+    cache.guardar(chave, plano)
+
+# Fallbacks no mesmo esquema, com os mesmos números dos fallbacks em markdown
+
+# Alimento -> (macronutriente que ele fornece, gramas do macronutriente em 100 g)
+ALIMENTOS = {
+    "Ovos": ("proteinas_g", 13),
+    "Peito de frango": ("proteinas_g", 31),
+    "Peixe": ("proteinas_g", 22),
+    "Whey protein": ("proteinas_g", 80),
+    "Aveia": ("carboidratos_g", 66),
+    "Arroz cozido": ("carboidratos_g", 28),
+    "Batata doce cozida": ("carboidratos_g", 20),
+    "Banana": ("carboidratos_g", 23),
+    "Frutas": ("carboidratos_g", 12),
+    "Castanhas": ("gorduras_g", 60),
+    "Azeite": ("gorduras_g", 100),
+    "Abacate": ("gorduras_g", 15),
+}
+KCAL_POR_GRAMA = {"proteinas_g": 4, "carboidratos_g": 4, "gorduras_g": 9}
+
+# Refeição -> (fração dos macronutrientes do dia, alimentos)
+REFEICOES_FALLBACK = (
+    ("Café da manhã", 0.15, ("Ovos", "Aveia", "Castanhas")),
+    ("Lanche da manhã", 0.10, ("Whey protein", "Frutas", "Castanhas")),
+    ("Almoço", 0.25, ("Peito de frango", "Arroz cozido", "Azeite")),
+    ("Lanche da tarde", 0.10, ("Ovos", "Frutas", "Abacate")),
+    ("Pré-treino", 0.10, ("Whey protein", "Banana", "Castanhas")),
+    ("Pós-treino", 0.10, ("Whey protein", "Arroz cozido", "Abacate")),
+    ("Jantar", 0.20, ("Peixe", "Batata doce cozida", "Azeite")),
+)
+
+@lru_cache(maxsize=4096)
+def _dieta_estruturada(masculino, peso):
+    macros = {"proteinas_g": int(peso * 2), "carboidratos_g": int(peso * 4), "gorduras_g": int(peso * 1)}
+    refeicoes = []
+    for nome, fracao, alimentos in REFEICOES_FALLBACK:
+        itens = []
+        for alimento in alimentos:
+            macro, densidade = ALIMENTOS[alimento]
+            gramas = round(macros[macro] * fracao, 1)
+            itens.append(Alimento(
+                nome=alimento,
+                quantidade=f"{round(gramas / densidade * 100)} g",
+                kcal=round(gramas * KCAL_POR_GRAMA[macro], 1),
+                **{chave: gramas if chave == macro else 0.0 for chave in KCAL_POR_GRAMA},
+            ))
+        refeicoes.append(Refeicao(nome=nome, alimentos=itens))
+    plano = PlanoAlimentar(
+        calorias_diarias=int(peso * (37 if masculino else 35)),
+        **macros,
+        refeicoes=refeicoes,
+        observacoes=[f"Hidrate-se bem! Beba pelo menos {int(peso * 35)} ml de água por dia (35 ml por kg de peso corporal)."],
+    )
+    return orjson.dumps(plano.model_dump())
+
+# Dias fixos da divisão; a sexta é dos grupos que o usuário quer focar
+DIVISAO_FALLBACK = (("Segunda", ("Peito", "Ombros")), ("Terça", ("Costas", "Braços")), ("Quinta", ("Pernas", "Glúteos")))
+PRINCIPIOS_FALLBACK = {
+    True: ["Treino com intensidade entre 70-85% de 1RM", "Aumente a carga quando completar todas as repetições"],
+    False: ["Utilize o peso corporal e resistência progressiva", "Varie o tempo sob tensão e os ângulos de execução"],
+}
+
+@lru_cache(maxsize=None)
+def _treino_estruturado(com_aparelhos, membros_foco):
+    repeticoes = "8-12" if com_aparelhos else "8-15"
+
+    def exercicios(grupos, foco):
+        return [
+            Exercicio(nome=nome, series=4 if foco else 3, repeticoes=repeticoes, descanso_s=90 if foco else 60)
+            for grupo in grupos
+            for nome in CATALOGO_EXERCICIOS[grupo][0 if com_aparelhos else 1][2 if foco else 0:][:2]
+        ]
+
+    dias = [DiaTreino(dia=dia, foco=" e ".join(grupos), exercicios=exercicios(grupos, False)) for dia, grupos in DIVISAO_FALLBACK]
+    foco = [grupo for grupo in CATALOGO_EXERCICIOS if grupo in membros_foco]
+    if foco:
+        dias.append(DiaTreino(dia="Sexta", foco=", ".join(foco), exercicios=exercicios(foco, True)))
+    plano = PlanoTreino(dias=dias, observacoes=["Descanse no sábado e no domingo", *PRINCIPIOS_FALLBACK[com_aparelhos]])
+    return orjson.dumps(plano.model_dump())
+
+def gerar_fallback_estruturado(dados_usuario, tipo_recomendacao):
+    if tipo_recomendacao == "dieta":
+        return _dieta_estruturada(dados_usuario['sexo'] == "Masculino", dados_usuario['peso'])
+    return _treino_estruturado(dados_usuario['tipo_treino'] == COM_APARELHOS, frozenset(dados_usuario['membros_foco']))
+
+# Linhas das tabelas de exibição (a partir do dict já validado, sem passar pelo pydantic de novo)
+def linhas_tabela(tipo_recomendacao, plano):
+    if tipo_recomendacao == "dieta":
+        return [
+            {
+                "Refeição": refeicao["nome"],
+                "Alimento": alimento["nome"],
+                "Quantidade": alimento["quantidade"],
+                "kcal": alimento["kcal"],
+                "Proteínas (g)": alimento["proteinas_g"],
+                "Carboidratos (g)": alimento["carboidratos_g"],
+                "Gorduras (g)": alimento["gorduras_g"],
+            }
+            for refeicao in plano["refeicoes"]
+            for alimento in refeicao["alimentos"]
+        ]
+    return [
+        {
+            "Dia": dia["dia"],
+            "Foco": dia["foco"],
+            "Exercício": exercicio["nome"],
+            "Séries": exercicio["series"],
+            "Repetições": exercicio["repeticoes"],
+            "Descanso (s)": exercicio["descanso_s"],
+        }
+        for dia in plano["dias"]
+        for exercicio in dia["exercicios"]
+    ]
+
+def _resumo(tipo_recomendacao, plano):
+    if tipo_recomendacao == "dieta":
+        return (
+            f"**Calorias diárias:** {plano['calorias_diarias']} kcal · **Proteínas:** {plano['proteinas_g']}g · "
+            f"**Carboidratos:** {plano['carboidratos_g']}g · **Gorduras:** {plano['gorduras_g']}g"
+        )
+    return f"**{len(plano['dias'])} dias de treino por semana**"
+
+def _celula(valor):
+    return "" if valor is None else f"{valor:g}" if isinstance(valor, float) else str(valor)
+
+# Markdown equivalente (download em texto, PDF e planos antigos), gerado uma vez por plano
+@lru_cache(maxsize=256)
+def plano_para_markdown(tipo_recomendacao, dados):
+    plano = orjson.loads(dados)
+    linhas = linhas_tabela(tipo_recomendacao, plano)
+    titulo = "Plano Alimentar" if tipo_recomendacao == "dieta" else "Programa de Treino"
+    partes = [f"## {titulo}", _resumo(tipo_recomendacao, plano)]
+    if linhas:
+        colunas = list(linhas[0])
+        partes.append("\n".join([
+            "| " + " | ".join(colunas) + " |",
+            "|" + "---|" * len(colunas),
+            *("| " + " | ".join(_celula(linha[coluna]) for coluna in colunas) + " |" for linha in linhas),
+        ]))
+    if plano["observacoes"]:
+        partes.append("\n".join(f"- {observacao}" for observacao in plano["observacoes"]))
+    return "\n\n".join(partes)
+
+# Resumo, uma tabela e as observações: três elementos por plano, qualquer que seja o tamanho dele.
+# A tabela vai como pyarrow.Table, que o st.dataframe serializa sem passar pelo pandas
+def exibir_plano(tipo_recomendacao, dados):
+    import pyarrow as pa
+    
+    plano = orjson.loads(dados)
+    st.markdown(_resumo(tipo_recomendacao, plano))
+    st.dataframe(pa.Table.from_pylist(linhas_tabela(tipo_recomendacao, plano)), hide_index=True, use_container_width=True)
+    if plano["observacoes"]:
+        st.markdown("\n".join(f"- {observacao}" for observacao in plano["observacoes"]))
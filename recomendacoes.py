@@ -0,0 +1,204 @@
+import os
+from functools import lru_cache
+
+from contagem_tokens import contar_tokens_mensagens
+from instrumentacao import cronometrado
+
+MODELO_LLM = "qwen/qwen2.5-vl-72b-instruct:free"
+
+SISTEMA = "Você é um especialista em nutrição esportiva e treinamento para hipertrofia. Forneça recomendações detalhadas, específicas e personalizadas."
+
+# Limite de tokens da resposta por tipo de recomendação, respeitando a janela de contexto do modelo
+MAX_TOKENS = {
+    "dieta": int(os.environ.get("LLM_MAX_TOKENS_DIETA", "1500")),
+    "programa de treino": int(os.environ.get("LLM_MAX_TOKENS_TREINO", "1800")),
+}
+MAX_TOKENS_PADRAO = int(os.environ.get("LLM_MAX_TOKENS_PADRAO", "1500"))
+JANELA_CONTEXTO = int(os.environ.get("LLM_JANELA_CONTEXTO", "32768"))
+# Modo estruturado: planos em JSON validado (módulo planos) em vez de markdown
+PLANOS_ESTRUTURADOS = os.environ.get("PLANOS_ESTRUTURADOS", "0") == "1"
+
+def _numero(valor):
+    return f"{valor:g}" if isinstance(valor, float) else str(valor)
+
+# Perfil em uma linha densa ("campo: valor; ..."); campos ausentes (ex.: perfis do lote) ficam de fora
+def descrever_perfil(dados_usuario):
+    campos = [
+        ("sexo", dados_usuario["sexo"]),
+        ("idade", dados_usuario["idade"]),
+        ("peso", f"{_numero(dados_usuario['peso'])} kg"),
+        ("altura", f"{_numero(dados_usuario['altura'])} cm"),
+        ("medidas (cm)", ", ".join(f"{parte} {_numero(medida)}" for parte, medida in dados_usuario["medidas"].items())),
+        ("foco", ", ".join(dados_usuario["membros_foco"])),
+        ("treino", dados_usuario["tipo_treino"]),
+        ("nível", dados_usuario.get("nivel")),
+        ("dias/semana", dados_usuario.get("dias_treino")),
+        ("restrições", ", ".join(dados_usuario.get("restricoes") or [])),
+    ]
+    return "; ".join(f"{nome}: {valor}" for nome, valor in campos if valor not in (None, ""))
+
+# Monta o corpo da requisição ao LLM (no modo estruturado, pedindo o JSON do esquema do plano)
+@cronometrado("montagem_prompt")
+def montar_payload_llm(dados_usuario, tipo_recomendacao, estruturado=PLANOS_ESTRUTURADOS):
+    pedido = f"Perfil: {descrever_perfil(dados_usuario)}\nGere uma {tipo_recomendacao} detalhada e personalizada para ganho de massa muscular."
+    if estruturado:
+        from planos import instrucao_formato
+        
+        pedido += "\n" + instrucao_formato(tipo_recomendacao)
+    mensagens = [
+        {"role": "system", "content": SISTEMA},
+        {"role": "user", "content": pedido},
+    ]
+    tokens_prompt = contar_tokens_mensagens(mensagens)
+    payload = {
+        "model": MODELO_LLM,
+        "messages": mensagens,
+        "max_tokens": max(1, min(MAX_TOKENS.get(tipo_recomendacao, MAX_TOKENS_PADRAO), JANELA_CONTEXTO - tokens_prompt)),
+        # Pede ao OpenRouter a contagem de tokens da chamada (no streaming, vem no último evento)
+        "usage": {"include": True},
+    }
+    if estruturado:
+        from planos import formato_resposta
+        
+        payload["response_format"] = formato_resposta(tipo_recomendacao)
+    return payload
+
+# Fallbacks para quando a API falhar: catálogo de exercícios e trechos de texto
+# montados uma única vez na importação; a renderização só junta os trechos prontos
+
+COM_APARELHOS = "Com aparelhos"
+
+# Grupo muscular -> (exercícios com aparelhos, exercícios sem aparelhos)
+CATALOGO_EXERCICIOS = {
+    "Peito": (
+        ["Supino reto com barra", "Crucifixo com halteres", "Supino inclinado na máquina", "Crossover no cabo"],
+        ["Flexões com variações", "Flexões declinadas", "Flexões diamante", "Dips entre cadeiras"],
+    ),
+    "Costas": (
+        ["Puxada na frente", "Remada curvada", "Pulldown", "Remada unilateral com halter"],
+        ["Barras", "Remadas invertidas", "Superman", "Remada com elástico"],
+    ),
+    "Pernas": (
+        ["Agachamento com barra", "Leg press", "Cadeira extensora", "Mesa flexora"],
+        ["Agachamentos", "Afundos", "Stiff com peso corporal", "Bulgarian split squat"],
+    ),
+    "Braços": (
+        ["Rosca direta", "Rosca scott", "Tríceps corda", "Tríceps francês"],
+        ["Rosca com elástico", "Dips para tríceps", "Flexões diamante", "Rosca martelo com garrafa pet"],
+    ),
+    "Ombros": (
+        ["Desenvolvimento com halteres", "Elevação lateral", "Face pull", "Desenvolvimento arnold"],
+        ["Pike push-ups", "Elevação lateral com garrafas", "Elevação frontal com objetos", "Flexões em Y"],
+    ),
+    "Glúteos": (
+        ["Hip thrust com barra", "Abdução de quadril na máquina", "Elevação pélvica", "Coice na polia"],
+        ["Hip thrust com peso corporal", "Ponte de glúteos", "Elevação de quadril unilateral", "Fire hydrant (hidrante)"],
+    ),
+}
+
+CABECALHO_TREINO = "## Programa de Treino Básico para Hipertrofia\n\n"
+
+# Divisão e princípios gerais por tipo de equipamento (True = com aparelhos)
+DIVISAO_TREINO = {
+    True: """
+        ### Divisão de treino recomendada:
+        - **Segunda**: Peito e Tríceps
+        - **Terça**: Costas e Bíceps
+        - **Quarta**: Descanso ou Cardio leve
+        - **Quinta**: Pernas, Glúteos e Ombros
+        - **Sexta**: Treino dos grupos que deseja focar mais
+        - **Sábado/Domingo**: Descanso
+        
+        ### Princípios gerais:
+        - 3-4 exercícios por grupo muscular
+        - 3-4 séries por exercício
+        - 8-12 repetições (foco em hipertrofia)
+        - Descanso de 60-90 segundos entre séries
+        - Treino com intensidade entre 70-85% de 1RM
+        """,
+    False: """
+        ### Divisão de treino recomendada:
+        - **Segunda**: Empurrar (peito, ombros, tríceps)
+        - **Terça**: Puxar (costas, bíceps)
+        - **Quarta**: Descanso ou Cardio leve
+        - **Quinta**: Pernas, Glúteos e Core
+        - **Sexta**: Circuito full body com foco nos grupos prioritários
+        - **Sábado/Domingo**: Descanso
+        
+        ### Princípios gerais:
+        - Utilizar o peso corporal e resistência progressiva
+        - Variar o tempo sob tensão e ângulos de execução
+        - 3-4 séries por exercício
+        - 8-15 repetições (foco em hipertrofia)
+        - Descanso de 60-90 segundos entre séries
+        """,
+}
+
+# Seção pronta de cada grupo muscular para cada tipo de equipamento
+SECOES_EXERCICIOS = {
+    (com_aparelhos, membro): f"\n### Exercícios específicos para {membro}:\n" + "\n".join(f"- {exercicio}" for exercicio in exercicios[0 if com_aparelhos else 1])
+    for membro, exercicios in CATALOGO_EXERCICIOS.items()
+    for com_aparelhos in (True, False)
+}
+ORDEM_MEMBROS = {membro: indice for indice, membro in enumerate(CATALOGO_EXERCICIOS)}
+
+MODELO_DIETA = """
+    ## Recomendação Básica de Dieta para Ganho de Massa
+    
+    ### Calorias diárias: {calorias} kcal
+    - Proteínas: {proteina}g ({kcal_proteina} kcal)
+    - Carboidratos: {carbs}g ({kcal_carbs} kcal)
+    - Gorduras: {gordura}g ({kcal_gordura} kcal)
+    
+    ### Distribuição das refeições:
+    1. **Café da manhã**: Rica em proteínas e carboidratos
+    2. **Lanche da manhã**: Proteína e gorduras boas
+    3. **Almoço**: Proteína, carboidratos complexos e vegetais
+    4. **Lanche da tarde**: Proteína e carboidratos
+    5. **Pré-treino**: Carboidratos rápidos e proteína
+    6. **Pós-treino**: Proteína e carboidratos rápidos
+    7. **Jantar**: Proteína e vegetais
+    
+    ### Alimentos recomendados:
+    - **Proteínas**: frango, peixe, carne vermelha magra, ovos, whey protein
+    - **Carboidratos**: arroz, batata doce, aveia, quinoa, frutas
+    - **Gorduras**: azeite, abacate, castanhas, sementes
+    
+    Hidrate-se bem! Beba pelo menos 35ml de água por kg de peso corporal.
+    """
+
+@lru_cache(maxsize=4096)
+def _renderizar_dieta(masculino, peso):
+    proteina = int(peso * 2)
+    carbs = int(peso * 4)
+    gordura = int(peso * 1)
+    return MODELO_DIETA.format(
+        calorias=int(peso * (37 if masculino else 35)),
+        proteina=proteina,
+        kcal_proteina=proteina * 4,
+        carbs=carbs,
+        kcal_carbs=carbs * 4,
+        gordura=gordura,
+        kcal_gordura=gordura * 9,
+    )
+
+def gerar_dieta_fallback(dados_usuario):
+    return _renderizar_dieta(dados_usuario['sexo'] == "Masculino", dados_usuario['peso'])
+
+# Uma entrada por combinação de equipamento e grupos (no máximo 2 x 2^6); as seções seguem a ordem do catálogo
+@lru_cache(maxsize=None)
+def _renderizar_treino(com_aparelhos, membros_foco):
+    secoes = [
+        SECOES_EXERCICIOS.get((com_aparelhos, membro), f"\n### Exercícios específicos para {membro}:\n")
+        for membro in sorted(membros_foco, key=lambda membro: (ORDEM_MEMBROS.get(membro, len(ORDEM_MEMBROS)), membro))
+    ]
+    return "".join([CABECALHO_TREINO, DIVISAO_TREINO[com_aparelhos], *secoes])
+
+def gerar_treino_fallback(dados_usuario):
+    return _renderizar_treino(dados_usuario['tipo_treino'] == COM_APARELHOS, frozenset(dados_usuario['membros_foco']))
+
+def gerar_fallback(dados_usuario, tipo_recomendacao):
+    if tipo_recomendacao == "dieta":
+        return gerar_dieta_fallback(dados_usuario)
+    else:
+        return gerar_treino_fallback(dados_usuario)
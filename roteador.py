@@ -0,0 +1,282 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import streamlit as st
+
+from instrumentacao import contar, percentil, registrar_coletor
+from openrouter import (
+    _postar,
+    ler_resposta_chat_completion,
+    ler_stream_chat_completion,
+    retentar_upstream,
+)
+
+# Modelos em ordem de preferência, separados por vírgula: "modelo" ou "modelo@url"
+# (sem url, a rota usa o OPENROUTER_URL)
+LLM_ROTAS = os.environ.get(
+    "LLM_ROTAS",
+    "qwen/qwen2.5-vl-72b-instruct:free,meta-llama/llama-3.3-70b-instruct:free",
+)
+# Últimas chamadas de cada rota consideradas na latência e na taxa de erro
+ROTEADOR_JANELA = int(os.environ.get("ROTEADOR_JANELA", "50"))
+ROTEADOR_AMOSTRAS_MINIMAS = int(os.environ.get("ROTEADOR_AMOSTRAS_MINIMAS", "5"))
+# Acima dessa taxa de erro a rota sai da frente da fila até passar a quarentena desde a última falha
+ROTEADOR_LIMITE_ERRO = float(os.environ.get("ROTEADOR_LIMITE_ERRO", "0.5"))
+ROTEADOR_QUARENTENA = float(os.environ.get("ROTEADOR_QUARENTENA", "30"))
+# Pedido em paralelo na próxima rota quando a primeira não respondeu até o p95 dela
+ROTEADOR_HEDGE = os.environ.get("ROTEADOR_HEDGE", "1") == "1"
+ROTEADOR_HEDGE_PADRAO = float(os.environ.get("ROTEADOR_HEDGE_PADRAO", "8"))
+ROTEADOR_HEDGE_MINIMO = float(os.environ.get("ROTEADOR_HEDGE_MINIMO", "0.5"))
+ROTEADOR_HEDGE_MAXIMO = float(os.environ.get("ROTEADOR_HEDGE_MAXIMO", "20"))
+# Segundos em que o tempo de uma tentativa cancelada ainda pesa na estimativa da rota
+ROTEADOR_VALIDADE_CENSURA = float(os.environ.get("ROTEADOR_VALIDADE_CENSURA", "60"))
+
+def ler_rotas(texto=LLM_ROTAS):
+    rotas = []
+    for item in texto.split(","):
+        modelo, _, url = item.strip().partition("@")
+        if modelo:
+            rotas.append(Rota(modelo, url or None))
+    # Sem rotas configuradas, o pedido segue com o modelo do próprio payload
+    return rotas or [Rota(None)]
+
+# Um modelo em um endpoint, com a janela das últimas latências e resultados
+class Rota:
+    def __init__(self, modelo, url=None, janela=ROTEADOR_JANELA):
+        self.modelo = modelo
+        self.url = url
+        # Segundos até o primeiro trecho (ou até a resposta inteira, sem streaming)
+        self.latencias = deque(maxlen=janela)
+        # True para sucesso, False para falha
+        self.resultados = deque(maxlen=janela)
+        # (instante, tempo decorrido) das tentativas que perderam a disputa: a latência real foi maior que isso
+        self.censuradas = deque(maxlen=janela)
+        self.ultima_medicao = None
+        self.ultima_falha = None
+
+    @property
+    def nome(self):
+        return self.modelo or "padrao"
+
+    def taxa_erro(self):
+        return self.resultados.count(False) / len(self.resultados) if self.resultados else 0.0
+
+    def saudavel(self, agora):
+        if len(self.resultados) < ROTEADOR_AMOSTRAS_MINIMAS or self.taxa_erro() < ROTEADOR_LIMITE_ERRO:
+            return True
+        # Passada a quarentena, a rota volta a ser tentada; uma nova falha a afasta de novo
+        return agora - self.ultima_falha >= ROTEADOR_QUARENTENA
+
+    def latencia(self, p):
+        return percentil(self.latencias, p) if self.latencias else None
+
+    # Latência usada na ordenação: a mediana das medições, que as tentativas canceladas só podem
+    # aumentar (são limites inferiores); None quando a rota ainda não foi medida nem cancelada.
+    # Um limite vale até a rota ser medida de novo ou até passar a validade: a rota que perde uma
+    # disputa vai para trás e deixa de ser disputada, então sem validade ela nunca voltaria à frente
+    def estimativa(self, agora):
+        limites = [
+            decorrido
+            for instante, decorrido in self.censuradas
+            if agora - instante < ROTEADOR_VALIDADE_CENSURA and (self.ultima_medicao is None or instante > self.ultima_medicao)
+        ]
+        if not self.latencias and not limites:
+            return None
+        return max(self.latencia(50) or 0.0, max(limites, default=0.0))
+
+# Um pedido em andamento em uma rota, rodando na própria thread. O primeiro trecho (ou a falha
+# antes dele) é avisado na fila de eventos da disputa; os trechos ficam na fila da tentativa
+class _Tentativa:
+    FIM = object()
+
+    def __init__(self, rota, trechos, eventos):
+        self.rota = rota
+        self.inicio = time.monotonic()
+        self.cancelada = False
+        self.fila = queue.Queue()
+        self._eventos = eventos
+        threading.Thread(target=self._executar, args=(trechos,), daemon=True, name="roteador").start()
+
+    def _executar(self, trechos):
+        recebeu = False
+        try:
+            for trecho in trechos:
+                # A tentativa que perdeu a disputa fecha a conexão no próximo trecho
+                if self.cancelada:
+                    trechos.close()
+                    return
+                self.fila.put(trecho)
+                if not recebeu:
+                    recebeu = True
+                    self._eventos.put((self, None))
+            if not recebeu:
+                raise RuntimeError(f"Resposta vazia de {self.rota.nome}")
+            self.fila.put(self.FIM)
+        except Exception as e:
+            if recebeu:
+                self.fila.put(e)
+            else:
+                self._eventos.put((self, e))
+
+    def cancelar(self):
+        self.cancelada = True
+
+    def restantes(self):
+        while True:
+            item = self.fila.get()
+            if item is self.FIM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+# Escolhe, para cada pedido, a rota saudável mais rápida; passa para a próxima quando ela falha
+# e dispara um pedido em paralelo quando ela demora mais que o próprio p95
+class Roteador:
+    def __init__(self, rotas=None, hedge=ROTEADOR_HEDGE):
+        self.rotas = rotas or ler_rotas()
+        self.hedge = hedge
+        self.contadores = Counter()
+        self._lock = threading.Lock()
+
+    # Saudáveis antes das em quarentena (que ficam como último recurso), depois pela latência
+    # estimada; rotas ainda sem medições vão na frente para serem conhecidas, na ordem configurada
+    def ordenar(self):
+        agora = time.monotonic()
+        with self._lock:
+            chaves = {
+                id(rota): (not rota.saudavel(agora), rota.estimativa(agora) or 0.0, indice)
+                for indice, rota in enumerate(self.rotas)
+            }
+        return sorted(self.rotas, key=lambda rota: chaves[id(rota)])
+
+    def prazo_hedge(self, rota):
+        with self._lock:
+            if len(rota.latencias) < ROTEADOR_AMOSTRAS_MINIMAS:
+                return ROTEADOR_HEDGE_PADRAO
+            return min(ROTEADOR_HEDGE_MAXIMO, max(ROTEADOR_HEDGE_MINIMO, rota.latencia(95)))
+
+    def _registrar_sucesso(self, rota, latencia):
+        with self._lock:
+            rota.latencias.append(latencia)
+            rota.ultima_medicao = time.monotonic()
+            rota.resultados.append(True)
+            self.contadores["vitorias"] += 1
+        contar("roteador_rota", modelo=rota.nome, resultado="sucesso")
+
+    def _registrar_falha(self, rota, erro):
+        with self._lock:
+            rota.resultados.append(False)
+            rota.ultima_falha = time.monotonic()
+            self.contadores["falhas"] += 1
+        contar("roteador_rota", modelo=rota.nome, resultado=type(erro).__name__)
+
+    # A tentativa que perdeu não respondeu até agora: o tempo decorrido não é uma latência (o hedge
+    # cancelado logo depois de disparado mediria quase zero), só um limite inferior para ela
+    def _registrar_cancelada(self, tentativa):
+        agora = time.monotonic()
+        with self._lock:
+            tentativa.rota.censuradas.append((agora, agora - tentativa.inicio))
+            self.contadores["canceladas"] += 1
+        contar("roteador_rota", modelo=tentativa.rota.nome, resultado="cancelada")
+
+    def _trechos(self, rota, payload, chave_api, sessao, streaming):
+        corpo = payload if rota.modelo is None else {**payload, "model": rota.modelo}
+        if streaming:
+            inicio = time.perf_counter()
+            response = _postar(sessao, {**corpo, "stream": True}, chave_api, None, stream=True, url=rota.url)
+            yield from ler_stream_chat_completion(response, corpo, inicio)
+        else:
+            response = _postar(sessao, corpo, chave_api, None, url=rota.url)
+            yield ler_resposta_chat_completion(response, corpo)["choices"][0]["message"]["content"]
+
+    # Devolve a primeira tentativa que produziu texto. Se todas as rotas falharem, o erro da última
+    # volta para as retentativas com backoff, que refazem a disputa do início. Com a `senha` do
+    # limitador, a primeira tentativa e cada failover esperam uma ficha (antes de a tentativa começar,
+    # para a espera na fila não entrar na latência da rota); o hedge só sai com uma ficha livre
+    @retentar_upstream
+    def _disputar(self, payload, chave_api, sessao, streaming, senha=None):
+        eventos = queue.Queue()
+        pendentes = deque(self.ordenar())
+        ativas = []
+        erro = None
+        hedge_disponivel = self.hedge
+
+        def iniciar_proxima(esperar_ficha=True):
+            if not pendentes:
+                return None
+            if esperar_ficha and senha is not None:
+                senha.aguardar()
+            rota = pendentes.popleft()
+            ativas.append(_Tentativa(rota, self._trechos(rota, payload, chave_api, sessao, streaming), eventos))
+            return rota
+
+        rota = iniciar_proxima()
+        prazo = time.monotonic() + self.prazo_hedge(rota) if hedge_disponivel else None
+        while ativas:
+            try:
+                tentativa, erro_tentativa = eventos.get(timeout=None if prazo is None else max(0.0, prazo - time.monotonic()))
+            except queue.Empty:
+                # Um pedido extra por geração, na próxima rota da ordem, se o limitador tiver ficha sobrando
+                prazo = None
+                hedge_disponivel = False
+                if not pendentes:
+                    continue
+                if senha is not None and not senha.tentar():
+                    with self._lock:
+                        self.contadores["hedges_sem_ficha"] += 1
+                    continue
+                iniciar_proxima(esperar_ficha=False)
+                with self._lock:
+                    self.contadores["hedges"] += 1
+                contar("roteador_hedge")
+                continue
+            ativas.remove(tentativa)
+            if erro_tentativa is None:
+                self._registrar_sucesso(tentativa.rota, time.monotonic() - tentativa.inicio)
+                for outra in ativas:
+                    outra.cancelar()
+                    self._registrar_cancelada(outra)
+                return tentativa
+            erro = erro_tentativa
+            self._registrar_falha(tentativa.rota, erro)
+            if not ativas:
+                # Todas as tentativas em andamento falharam: failover para a próxima rota
+                rota = iniciar_proxima()
+                if rota is not None and hedge_disponivel:
+                    prazo = time.monotonic() + self.prazo_hedge(rota)
+        raise erro
+
+    # Trechos de texto da rota vencedora; falhas depois do primeiro trecho não trocam de rota
+    def transmitir(self, payload, chave_api, sessao, streaming, senha=None):
+        tentativa = self._disputar(payload, chave_api, sessao, streaming, senha)
+        try:
+            yield from tentativa.restantes()
+        except Exception as e:
+            self._registrar_falha(tentativa.rota, e)
+            raise
+
+    def estatisticas(self):
+        agora = time.monotonic()
+        with self._lock:
+            resultado = dict(self.contadores)
+            for indice, rota in enumerate(self.rotas):
+                resultado[f"rota{indice}_saudavel"] = int(rota.saudavel(agora))
+                resultado[f"rota{indice}_taxa_erro"] = round(rota.taxa_erro(), 3)
+                if rota.latencias:
+                    resultado[f"rota{indice}_p50_s"] = round(rota.latencia(50), 3)
+                    resultado[f"rota{indice}_p95_s"] = round(rota.latencia(95), 3)
+                estimativa = rota.estimativa(agora)
+                if rota.censuradas and estimativa is not None:
+                    resultado[f"rota{indice}_estimativa_s"] = round(estimativa, 3)
+            return resultado
+
+# Roteador único do processo: a saúde das rotas vale para todas as sessões
+@st.cache_resource
+def obter_roteador():
+    roteador = Roteador()
+    registrar_coletor("roteador", roteador.estatisticas)
+    return roteador
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from instrumentacao import registrar_coletor
+
+# Threads que executam as gerações (compartilhadas entre sessões)
+TAREFAS_TRABALHADORES = int(os.environ.get("TAREFAS_TRABALHADORES", "8"))
+# Tempo que uma tarefa concluída continua na tabela para as sessões que ainda vão consultá-la
+TAREFAS_TTL = float(os.environ.get("TAREFAS_TTL", "600"))
+# Intervalo entre as consultas da página a uma tarefa em andamento
+TAREFAS_INTERVALO_CONSULTA = float(os.environ.get("TAREFAS_INTERVALO_CONSULTA", "0.2"))
+
+# Tabela de tarefas de geração: cada tarefa é indexada pelo hash do perfil (pedidos iguais de
+# qualquer sessão se juntam à mesma) e cada sessão guarda qual tarefa acompanha em cada aba.
+# Um rerun no meio da geração só volta a consultar a tarefa; as concluídas expiram após o TTL
+class TabelaTarefas:
+    def __init__(self, trabalhadores=TAREFAS_TRABALHADORES, ttl=TAREFAS_TTL):
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="llm")
+        self.contadores = Counter()
+        # Hash do perfil -> geração (em andamento ou concluída há menos que o TTL)
+        self._tarefas = {}
+        # (sessão, nome) -> hash do perfil
+        self._sessoes = {}
+        # (instante, hash, geração) na ordem de conclusão, para a coleta olhar só as expiradas
+        self._concluidas = deque()
+        self._lock = threading.Lock()
+
+    # Associa a tarefa do perfil à sessão, iniciando-a só se não houver uma em andamento ou
+    # concluída com sucesso (uma tarefa que falhou é refeita no próximo pedido)
+    def obter_ou_iniciar(self, sessao, nome, chave, iniciar):
+        with self._lock:
+            self._coletar()
+            self._sessoes[(sessao, nome)] = chave
+            geracao = self._tarefas.get(chave)
+            if geracao is not None and not (geracao.concluida and geracao.erro is not None):
+                self.contadores["anexadas"] += 1
+                return geracao
+            geracao = self._tarefas[chave] = iniciar()
+            self.contadores["iniciadas"] += 1
+        geracao.ao_finalizar(lambda concluida: self._concluir(chave, concluida))
+        return geracao
+
+    # Tarefa que a sessão acompanha com esse nome (None se não houver ou se já expirou)
+    def consultar(self, sessao, nome):
+        with self._lock:
+            self._coletar()
+            chave = self._sessoes.get((sessao, nome))
+            return self._tarefas.get(chave) if chave is not None else None
+
+    # A sessão já guardou o resultado e não vai mais consultar a tarefa
+    def liberar(self, sessao, nome):
+        with self._lock:
+            self._sessoes.pop((sessao, nome), None)
+
+    def _concluir(self, chave, geracao):
+        with self._lock:
+            self._concluidas.append((time.monotonic(), chave, geracao))
+            self.contadores["com_erro" if geracao.erro is not None else "concluidas"] += 1
+
+    # Chamada com o lock: remove as tarefas concluídas há mais que o TTL e as sessões que apontavam para elas
+    def _coletar(self):
+        limite = time.monotonic() - self.ttl
+        expiradas = set()
+        while self._concluidas and self._concluidas[0][0] <= limite:
+            _, chave, geracao = self._concluidas.popleft()
+            if self._tarefas.get(chave) is geracao:
+                del self._tarefas[chave]
+                expiradas.add(chave)
+        if expiradas:
+            self.contadores["expiradas"] += len(expiradas)
+            for sessao, chave in list(self._sessoes.items()):
+                if chave in expiradas:
+                    del self._sessoes[sessao]
+
+    def estatisticas(self):
+        with self._lock:
+            self._coletar()
+            em_andamento = sum(not geracao.concluida for geracao in self._tarefas.values())
+            return {
+                **self.contadores,
+                "em_andamento": em_andamento,
+                "tarefas": len(self._tarefas),
+                "sessoes": len(self._sessoes),
+            }
+
+# Tabela e pool únicos do processo, compartilhados por todas as sessões
+@st.cache_resource
+def obter_tabela_tarefas():
+    tarefas = TabelaTarefas()
+    registrar_coletor("tarefas", tarefas.estatisticas)
+    return tarefas